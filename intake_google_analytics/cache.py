@@ -0,0 +1,163 @@
+import json
+import os
+import re
+import tempfile
+import time
+
+import pandas as pd
+
+from .utils import body_key, resolve_date
+
+DEFAULT_TTL = 3600
+
+RELATIVE_DATE = re.compile(r'^(today|yesterday|\d+DaysAgo)$')
+
+# Parquet key-value metadata holding ``df.attrs`` and the state of an entry
+METADATA_KEY = b'intake_google_analytics'
+
+
+class QueryCache(object):
+    """
+    Persistent cache of query results keyed by the batchGet request body
+
+    Results are stored as one Parquet file per request body in ``path``.
+    Entries for reports whose date range is relative (``'yesterday'``,
+    ``'NDaysAgo'``, ...) or reaches today expire after ``ttl`` seconds,
+    all other entries never expire. When ``max_bytes`` is set the least
+    recently used entries are evicted to keep the directory below that size.
+
+    ``df.attrs``, the categorical columns and an optional JSON-serializable
+    ``state`` are kept in the Parquet key-value metadata of each entry,
+    independent of the pandas version.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL, max_bytes=None):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError('The query cache requires pyarrow to store Parquet files.')
+
+        self.path = os.path.expanduser(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(self.path, exist_ok=True)
+
+    def _filename(self, key):
+        return os.path.join(self.path, f'{key}.parquet')
+
+    @staticmethod
+    def is_volatile(body):
+        """True when the data for this body may still change"""
+        today = resolve_date('today')
+        for request in body['reportRequests']:
+            for date_range in request['dateRanges']:
+                for value in date_range.values():
+                    if RELATIVE_DATE.match(value) or resolve_date(value) >= today:
+                        return True
+        return False
+
+    def get(self, body):
+        """Return the cached DataFrame for ``body`` or None"""
+        return self.load(body_key(body), volatile=self.is_volatile(body))
+
+    def put(self, body, df):
+        """Store ``df`` as the result for ``body``"""
+        self.store(body_key(body), df)
+
+    def load(self, key, volatile=False):
+        """Return the DataFrame stored under ``key`` or None
+
+        Volatile entries older than the ttl are removed instead.
+        """
+        return self.load_state(key, volatile=volatile)[0]
+
+    def load_state(self, key, volatile=False):
+        """Return the DataFrame and the state stored under ``key``, or ``(None, None)``"""
+        import pyarrow.parquet as pq
+
+        filename = self._filename(key)
+        try:
+            stat = os.stat(filename)
+        except FileNotFoundError:
+            return None, None
+
+        now = time.time()
+        if volatile and self.ttl is not None and now - stat.st_mtime > self.ttl:
+            self._remove(filename)
+            return None, None
+
+        try:
+            table = pq.read_table(filename)
+        except (FileNotFoundError, OSError):
+            return None, None
+
+        df = table.to_pandas()
+        stored = json.loads((table.schema.metadata or {}).get(METADATA_KEY, b'{}'))
+        df.attrs = stored.get('attrs', {})
+        # empty categorical columns come back as object
+        for column in stored.get('categorical', []):
+            if not isinstance(df[column].dtype, pd.CategoricalDtype):
+                df[column] = df[column].astype('category')
+
+        # the access time orders entries for eviction, mtime keeps the age for the ttl
+        try:
+            os.utime(filename, (now, stat.st_mtime))
+        except FileNotFoundError:
+            pass
+        return df, stored.get('state')
+
+    def store(self, key, df, state=None):
+        """Store ``df`` and ``state`` under ``key``, ``df.attrs`` are kept"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(df)
+        metadata = dict(table.schema.metadata or {})
+        categorical = [c for c, dtype in df.dtypes.items()
+                       if isinstance(dtype, pd.CategoricalDtype)]
+        metadata[METADATA_KEY] = json.dumps({'attrs': df.attrs, 'state': state,
+                                             'categorical': categorical},
+                                            default=str).encode('utf-8')
+        table = table.replace_schema_metadata(metadata)
+
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        os.close(fd)
+        try:
+            pq.write_table(table, tmp)
+            os.replace(tmp, self._filename(key))
+        finally:
+            self._remove(tmp)
+
+        if self.max_bytes is not None:
+            self._evict()
+
+    def clear(self):
+        for entry in self._entries():
+            self._remove(entry.path)
+
+    def _entries(self):
+        return [e for e in os.scandir(self.path) if e.name.endswith('.parquet')]
+
+    def _evict(self):
+        # other threads or processes may remove entries while we scan
+        stats = []
+        for entry in self._entries():
+            try:
+                stats.append((entry.path, entry.stat()))
+            except FileNotFoundError:
+                continue
+
+        stats.sort(key=lambda item: item[1].st_atime)
+        total = sum(stat.st_size for _, stat in stats)
+        for filename, stat in stats:
+            if total <= self.max_bytes:
+                break
+            total -= stat.st_size
+            self._remove(filename)
+
+    @staticmethod
+    def _remove(filename):
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
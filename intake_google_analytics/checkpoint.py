@@ -0,0 +1,69 @@
+import copy
+import json
+import os
+import shutil
+import tempfile
+
+from .utils import as_day, body_key, resolve_date
+
+
+class Checkpoint(object):
+    """
+    Pages of one paginated request written to disk as they arrive
+
+    The pages are stored in a directory named after the hash of the request
+    ``body``, so running the same request again finds them. Each page is
+    saved together with the ``pageToken`` that requested it.
+
+    Relative dates like ``'yesterday'`` are resolved before hashing, so a
+    pull resumed on a later day does not reuse pages of another date range.
+    """
+
+    def __init__(self, path, body):
+        self.path = os.path.join(os.path.expanduser(path), body_key(self.resolve(body)))
+
+    @staticmethod
+    def resolve(body):
+        """A copy of ``body`` with every date range as concrete ``YYYY-MM-DD`` dates"""
+        body = copy.deepcopy(body)
+        for request in body['reportRequests']:
+            for date_range in request.get('dateRanges', []):
+                for k, v in date_range.items():
+                    date_range[k] = as_day(resolve_date(v))
+        return body
+
+    def pages(self):
+        """Yield the stored ``(page_token, filename)`` pairs in the order they were fetched
+
+        Only the page token is read, load the report with :meth:`load`.
+        """
+        try:
+            names = sorted(n for n in os.listdir(self.path) if n.endswith('.json'))
+        except FileNotFoundError:
+            return
+
+        for name in names:
+            filename = os.path.join(self.path, name)
+            with open(filename) as f:
+                yield json.loads(f.readline())['pageToken'], filename
+
+    @staticmethod
+    def load(filename):
+        """The report stored in the page file ``filename``"""
+        with open(filename) as f:
+            f.readline()
+            return json.load(f)
+
+    def add(self, page_token, report):
+        os.makedirs(self.path, exist_ok=True)
+        index = len([n for n in os.listdir(self.path) if n.endswith('.json')])
+
+        # the token has a line of its own, so it is read without the report
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(json.dumps({'pageToken': page_token}) + '\n')
+            json.dump(report, f)
+        os.replace(tmp, os.path.join(self.path, f'{index:08d}.json'))
+
+    def remove(self):
+        shutil.rmtree(self.path, ignore_errors=True)
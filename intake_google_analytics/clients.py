@@ -0,0 +1,76 @@
+import os
+import threading
+
+from google.oauth2.service_account import Credentials
+from googleapiclient import discovery
+
+SCOPES = ['https://www.googleapis.com/auth/analytics.readonly']
+
+_credentials = {}
+_credentials_lock = threading.Lock()
+_resources = threading.local()
+# bumped by clear(), resources and clients built under an older generation are stale
+_generation = 0
+
+
+def _key(credentials_path):
+    return os.path.abspath(os.path.expanduser(credentials_path))
+
+
+def get_credentials(credentials_path):
+    """Service account credentials shared by every client in the process
+
+    The file is read once per path and the returned object is shared, so an
+    access token refreshed by one client is reused by all of them. The
+    credentials are scoped up front, otherwise every client would refresh
+    its own scoped copy.
+    """
+    key = _key(credentials_path)
+    with _credentials_lock:
+        credentials = _credentials.get(key)
+        if credentials is None:
+            credentials = _credentials[key] = Credentials.from_service_account_file(
+                key, scopes=SCOPES)
+    return credentials
+
+
+def generation():
+    """Counter increased by every :func:`clear`
+
+    Objects caching a resource keep the generation it was built in and
+    rebuild it once the generation changed.
+    """
+    return _generation
+
+
+def get_reports_resource(credentials_path):
+    """The Reporting API v4 ``reports`` resource for ``credentials_path``
+
+    Resources are built once per credentials file and thread, since the
+    underlying httplib2 transport must not be shared between threads.
+    """
+    key = _key(credentials_path)
+    resources = getattr(_resources, 'reports', None)
+    if resources is None or _resources.generation != _generation:
+        resources = _resources.reports = {}
+        _resources.generation = _generation
+
+    resource = resources.get(key)
+    if resource is None:
+        resource = resources[key] = discovery.build(
+            'analyticsreporting', 'v4',
+            credentials=get_credentials(key),
+            cache_discovery=False
+        ).reports()
+    return resource
+
+
+def clear():
+    """Forget all shared credentials and resources, e.g. after rotating keys
+
+    Resources of other threads are dropped on their next use.
+    """
+    global _generation
+    with _credentials_lock:
+        _credentials.clear()
+        _generation += 1
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+
+ASYNC_POLL_INTERVAL = 0.01
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+class RateLimiter(object):
+    """
+    Token bucket limiting requests per second and requests in flight
+
+    ``requests_per_second`` tokens are added to the bucket every second, up
+    to ``burst`` tokens (by default one second worth). Each request takes
+    one token and counts towards ``max_in_flight`` until it is released.
+    Either limit may be None to leave it unbounded. Use it as a context
+    manager, or an async context manager, around each request.
+    """
+
+    def __init__(self, requests_per_second=None, max_in_flight=None, burst=None):
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._updated = time.monotonic()
+        self.configure(requests_per_second, max_in_flight, burst)
+
+    def configure(self, requests_per_second=None, max_in_flight=None, burst=None):
+        with self._cond:
+            self.requests_per_second = requests_per_second
+            self.max_in_flight = max_in_flight
+            if burst is None and requests_per_second is not None:
+                burst = max(1, requests_per_second)
+            self._capacity = burst or 1
+            self._tokens = min(getattr(self, '_tokens', self._capacity), self._capacity)
+            self._cond.notify_all()
+
+    def _refill(self, now):
+        if self.requests_per_second is not None:
+            elapsed = now - self._updated
+            self._tokens = min(self._capacity, self._tokens + elapsed * self.requests_per_second)
+        self._updated = now
+
+    def _try_acquire(self):
+        """Take a slot if one is free, otherwise return how long to wait
+
+        Returns 0 once acquired and None when only a release can free a slot.
+        """
+        self._refill(time.monotonic())
+
+        if self.max_in_flight is not None and self._in_flight >= self.max_in_flight:
+            return None
+        if self.requests_per_second is not None:
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.requests_per_second
+            self._tokens -= 1
+
+        self._in_flight += 1
+        return 0
+
+    def acquire(self):
+        with self._cond:
+            wait = self._try_acquire()
+            while wait != 0:
+                self._cond.wait(wait)
+                wait = self._try_acquire()
+
+    async def aacquire(self):
+        while True:
+            with self._cond:
+                wait = self._try_acquire()
+            if wait == 0:
+                return
+            # never block the event loop on the condition, poll instead
+            await asyncio.sleep(ASYNC_POLL_INTERVAL if wait is None else wait)
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    async def __aenter__(self):
+        await self.aacquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+def get_limiter(scope, requests_per_second=None, max_in_flight=None, burst=None):
+    """The process-wide limiter for ``scope``
+
+    Every caller with the same scope, e.g. ``('view', '12345')``, shares one
+    limiter. The limits of the most recent call apply.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(scope)
+        if limiter is None:
+            limiter = _limiters[scope] = RateLimiter(requests_per_second, max_in_flight, burst)
+        else:
+            limiter.configure(requests_per_second, max_in_flight, burst)
+    return limiter
+
+
+def clear():
+    with _limiters_lock:
+        _limiters.clear()
@@ -0,0 +1,73 @@
+import asyncio
+import random
+import socket
+import time
+
+from googleapiclient.errors import HttpError
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# 403 responses that only mean "slow down"
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+
+RETRY_EXCEPTIONS = (ConnectionError, TimeoutError, socket.timeout)
+
+
+class RetryPolicy(object):
+    """
+    Retry failed requests with exponential backoff and full jitter
+
+    A request is attempted at most ``max_attempts`` times. Before attempt
+    ``n + 1`` the policy sleeps for a random time between zero and
+    ``min(max_backoff, backoff * 2 ** (n - 1))`` seconds. HTTP errors with a
+    status in ``statuses`` (or a 403 rate-limit reason) and exceptions of the
+    types in ``exceptions`` are retried, all other errors are raised at once.
+    """
+
+    def __init__(self, max_attempts=5, backoff=1.0, max_backoff=32.0,
+                 statuses=RETRY_STATUSES, exceptions=RETRY_EXCEPTIONS):
+        if max_attempts < 1:
+            raise ValueError(f'max_attempts must be at least 1, got {max_attempts}')
+
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = tuple(statuses)
+        self.exceptions = tuple(exceptions)
+
+    def is_retryable(self, error):
+        if isinstance(error, HttpError):
+            status = error.resp.status
+            if status in self.statuses:
+                return True
+            content = error.content.decode('utf-8', 'replace') \
+                if isinstance(error.content, bytes) else str(error.content)
+            return status == 403 and any(r in content for r in RATE_LIMIT_REASONS)
+        return isinstance(error, self.exceptions)
+
+    def delay(self, attempt):
+        """Seconds to wait after the ``attempt``-th failure"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+    def call(self, func, *args, **kwargs):
+        attempt = 1
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_attempts or not self.is_retryable(e):
+                    raise
+            time.sleep(self.delay(attempt))
+            attempt += 1
+
+    async def acall(self, func, *args, **kwargs):
+        """Like :meth:`call` for a coroutine function"""
+        attempt = 1
+        while True:
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_attempts or not self.is_retryable(e):
+                    raise
+            await asyncio.sleep(self.delay(attempt))
+            attempt += 1
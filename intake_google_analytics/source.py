@@ -1,17 +1,33 @@
+import asyncio
+import copy
 import datetime as dt
+import json
 import re
+import threading
+import warnings
 from collections import OrderedDict
+from contextlib import AsyncExitStack, ExitStack, asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 from typing import Union
-from numpy import exp
 
+import httplib2
+import numpy as np
 import pandas as pd
-from google.oauth2.service_account import Credentials
-from googleapiclient import discovery
+from google.auth.transport.requests import Request as AuthRequest
+from googleapiclient.errors import HttpError
 from intake.source.base import DataSource, Schema
-from pandas.api.types import is_string_dtype
+from pandas.api.types import is_datetime64_any_dtype
 
 from . import __version__
-from .utils import as_day, is_dt
+from . import clients
+from .clients import get_credentials, get_reports_resource
+from .ratelimit import get_limiter
+from .retry import RetryPolicy
+from .cache import DEFAULT_TTL, QueryCache
+from .checkpoint import Checkpoint
+from .utils import (as_day, body_key, concat_frames, date_ranges, is_dt, merge_date_ranges,
+                    merge_sampling, parse_date_values, resolve_date, sampling_stats,
+                    split_date_range, subtract_date_ranges)
 
 DTYPES = {
     "INTEGER": int,
@@ -30,12 +46,86 @@ DATETIME_FORMATS = OrderedDict([
     ('%Y%m%d%H%M', re.compile(r'^(?P<year>[0-9]{4})(?P<month>1[0-2]|0[1-9])(?P<day>3[01]|0[1-9]|[12][0-9])(?P<hour>2[0-3]|[01][0-9])(?P<minute>[0-5][0-9])$'))
 ])
 
+# the date dimensions of the Reporting API, parsed without inspecting their values
+DATE_DIMENSIONS = {
+    'ga:date': '%Y%m%d',
+    'ga:dateHour': '%Y%m%d%H',
+    'ga:dateHourMinute': '%Y%m%d%H%M',
+    'ga:yearMonth': '%Y%m',
+}
+
+# time dimensions whose values can look like dates but are not, never parsed
+NON_DATE_DIMENSIONS = [
+    'ga:year', 'ga:month', 'ga:week', 'ga:day', 'ga:hour', 'ga:minute',
+    'ga:yearWeek', 'ga:isoWeek', 'ga:isoYear', 'ga:isoYearIsoWeek',
+    'ga:nthMonth', 'ga:nthWeek', 'ga:nthDay', 'ga:nthHour', 'ga:nthMinute',
+    'ga:dayOfWeek', 'ga:dayOfWeekName',
+]
+
+BATCH_GET_URL = 'https://analyticsreporting.googleapis.com/v4/reports:batchGet'
+
+MAX_PAGE_SIZE = 100000
+MAX_REPORT_REQUESTS = 5
+MAX_METRICS = 10
+SAMPLING_LEVELS = ['SMALL', 'DEFAULT', 'LARGE']
+RATE_LIMIT_SCOPES = ['project', 'view']
+BATCH_KEYS = ['viewId', 'dateRanges', 'samplingLevel', 'segments', 'cohortGroup']
+# the arguments of query() that query_many() accepts per query
+QUERY_MANY_ARGUMENTS = ['view_id', 'start_date', 'end_date', 'metrics', 'dimensions',
+                        'filters', 'page_size', 'sampling_level']
+
+# date dimensions that cannot be split at day boundaries
+MONTHLY_DIMENSIONS = ['ga:yearMonth']
+
+# date dimensions that keep the rows of different days apart
+DAILY_DIMENSIONS = ['ga:date', 'ga:dateHour', 'ga:dateHourMinute']
+
+# metrics of these types can be summed across date ranges, unless listed below
+ADDITIVE_TYPES = ['INTEGER', 'CURRENCY']
+NON_ADDITIVE_METRICS = ['ga:users', 'ga:1dayUsers', 'ga:7dayUsers', 'ga:14dayUsers',
+                        'ga:28dayUsers', 'ga:30dayUsers']
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_ROWS_PER_PARTITION = 500000
+
+CATEGORICAL_OPTIONS = [False, True, 'auto']
+# dimensions with few distinct values, categorical with categorical='auto'
+CATEGORICAL_DIMENSIONS = [
+    'ga:userType', 'ga:userGender', 'ga:userAgeBracket', 'ga:sessionCount',
+    'ga:channelGrouping', 'ga:medium', 'ga:source', 'ga:sourceMedium',
+    'ga:deviceCategory', 'ga:browser', 'ga:operatingSystem', 'ga:mobileDeviceBranding',
+    'ga:continent', 'ga:subContinent', 'ga:country', 'ga:region', 'ga:language',
+    'ga:dayOfWeekName', 'ga:hostname',
+]
+
 YYYY_MM_DD = re.compile(r'^(?P<year>[0-9]{4})-(?P<month>1[0-2]|0[1-9])-(?P<day>3[01]|0[1-9]|[12][0-9])$')
 
 
 class GoogleAnalyticsQuerySource(DataSource):
     """
     Run a Google Analytics (Universal Analytics) query and return a Data Frame
+
+    When ``partition_by`` is one of ``'day'``, ``'week'`` or ``'month'`` the
+    date range is split into calendar sub-ranges and each partition fetches
+    only its own slice of the report. With ``partition_by='auto'`` the
+    sub-ranges are chosen from ``rowCount`` probes to hold about
+    ``rows_per_partition`` rows each, see :meth:`GoogleAnalyticsAPI.plan_partitions`.
+
+    With ``incremental=True`` the rows fetched so far are kept in ``cache_dir``
+    and later reads only request the days that are missing, plus the last
+    ``settle_days`` days which Google Analytics may still be processing. The
+    query must include a date dimension such as ``ga:date``.
+
+    ``categorical`` builds dimension columns as ``pd.Categorical``, see
+    :class:`GoogleAnalyticsAPI`.
+
+    ``retry`` holds the keyword arguments of the :class:`RetryPolicy`, the
+    defaults retry every request. ``retry=None`` disables retries, like it
+    does for :class:`GoogleAnalyticsAPI`.
+
+    ``view_id`` may be a list to run the same query on several views. Every
+    view gets its own partitions, ``read()`` fetches them concurrently on
+    ``max_concurrent_views`` threads and the result has a ``view_id`` column.
     """
 
     name = 'google_analytics_query'
@@ -45,10 +135,21 @@ class GoogleAnalyticsQuerySource(DataSource):
 
     def __init__(self, view_id, start_date, end_date,
                  metrics, dimensions=None, filters=None,
-                 credentials_path=None,
+                 credentials_path=None, partition_by=None,
+                 max_concurrent_pages=None, page_size=MAX_PAGE_SIZE,
+                 cache_dir=None, cache_ttl=DEFAULT_TTL, cache_max_bytes=None,
+                 incremental=False, settle_days=2, retry={}, rate_limit=None,
+                 checkpoint_dir=None, unsampled=False, max_workers=DEFAULT_MAX_WORKERS,
+                 sampling_level=None, categorical=False,
+                 max_concurrent_views=DEFAULT_MAX_WORKERS,
+                 rows_per_partition=DEFAULT_ROWS_PER_PARTITION,
                  metadata=None):
 
         self._df = None
+        self._meta = None
+        self._row_count = None
+        self._partitions = None
+        self._probe_sampling = None
 
         self._view_id = view_id
         self._start_date = start_date
@@ -57,66 +158,807 @@ class GoogleAnalyticsQuerySource(DataSource):
         self._dimensions = dimensions
         self._filters = filters
         self._credentials_path = credentials_path
+        self._partition_by = partition_by
+        self._page_size = page_size
+        self._incremental = incremental
+        self._settle_days = settle_days
+        self._unsampled = unsampled
+        self._sampling_level = sampling_level
+        self._categorical = categorical
+        self._max_concurrent_views = max_concurrent_views
+        self._rows_per_partition = rows_per_partition
+        self._sampling = {}
 
-        self._client = GoogleAnalyticsAPI(credentials_path=credentials_path)
+        if isinstance(view_id, (list, tuple)) and not view_id:
+            raise ValueError('view_id must contain at least one view')
+
+        if incremental and cache_dir is None:
+            raise ValueError('incremental=True requires a cache_dir to store the fetched rows')
+        if incremental and partition_by is not None:
+            raise ValueError('incremental=True cannot be combined with partition_by')
+
+        cache = None
+        if cache_dir is not None:
+            cache = QueryCache(cache_dir, ttl=cache_ttl, max_bytes=cache_max_bytes)
+        self._cache = cache
+
+        self._client = GoogleAnalyticsAPI(credentials_path=credentials_path,
+                                          max_concurrent_pages=max_concurrent_pages,
+                                          cache=cache,
+                                          retry=None if retry is None else RetryPolicy(**retry),
+                                          rate_limit=rate_limit,
+                                          checkpoint_dir=checkpoint_dir,
+                                          max_workers=max_workers,
+                                          categorical=categorical)
 
         super(GoogleAnalyticsQuerySource, self).__init__(metadata=metadata)
 
+    def _date_partitions(self):
+        if self._partition_by is None:
+            return [(self._start_date, self._end_date)]
+        return date_ranges(self._start_date, self._end_date, self._partition_by)
+
+    @property
+    def _views(self):
+        if isinstance(self._view_id, (list, tuple)):
+            return list(self._view_id)
+        return [self._view_id]
+
+    @property
+    def _multi_view(self):
+        return isinstance(self._view_id, (list, tuple))
+
+    def _make_partitions(self):
+        # one (view_id, start_date, end_date) per view and date range
+        partitions = []
+        for view_id in self._views:
+            if self._partition_by == 'auto':
+                ranges = self._client.plan_partitions(
+                    view_id=view_id, start_date=self._start_date, end_date=self._end_date,
+                    metrics=self._metrics, dimensions=self._dimensions, filters=self._filters,
+                    sampling_level=self._sampling_level,
+                    rows_per_partition=self._rows_per_partition
+                )
+            else:
+                ranges = self._date_partitions()
+            partitions.extend((view_id, start_date, end_date) for start_date, end_date in ranges)
+        return partitions
+
+    def _query_kwargs(self, i, columns=None):
+        view_id, start_date, end_date = self._partitions[i]
+        return dict(
+            view_id=view_id,
+            start_date=start_date, end_date=end_date,
+            metrics=self._project_metrics(columns),
+            dimensions=self._dimensions,
+            filters=self._filters,
+            page_size=self._page_size,
+            sampling_level=self._sampling_level,
+        )
+
+    def _project_metrics(self, columns=None):
+        """The metrics of the query needed to return ``columns``
+
+        Every dimension is always requested, because the dimensions define
+        the rows of a report. The API requires at least one metric, so the
+        first metric is kept when ``columns`` only names dimensions.
+        """
+        if columns is None:
+            return self._metrics
+
+        names = [m.get('alias', m['expression']) if isinstance(m, dict) else m
+                 for m in self._metrics]
+        known = set(names)
+        known.update(d['name'] if isinstance(d, dict) else d for d in self._dimensions or [])
+        if self._multi_view:
+            known.add('view_id')
+        unknown = [c for c in columns if c not in known]
+        if unknown:
+            raise ValueError(f'{", ".join(map(str, unknown))} is not a column of this query.\n'
+                             f'Please use one of {", ".join(names + sorted(known - set(names)))}')
+
+        metrics = [m for m, name in zip(self._metrics, names) if name in columns]
+        return metrics or self._metrics[:1]
+
+    def _fetch(self, i, date_range=None, columns=None):
+        if self._incremental:
+            # the stored history holds every metric
+            df = self._fetch_incremental(i)
+        else:
+            kwargs = self._query_kwargs(i, columns)
+            if date_range is not None:
+                kwargs.update(start_date=date_range[0], end_date=date_range[1])
+            df = self._client.query(unsampled=self._unsampled, **kwargs)
+
+        key = i if date_range is None else (i, date_range)
+        self._sampling[key] = df.attrs.get('sampling')
+        if date_range is None:
+            self._update_sampling(range(len(self._partitions)))
+        df = self._add_view_column(df, self._partitions[i][0])
+        if columns is not None:
+            df = df[list(columns)]
+        return df
+
+    def _update_sampling(self, keys):
+        # only the stats of ``keys`` describe the data read last
+        sampling = merge_sampling(self._sampling.get(key) for key in keys)
+        if sampling is not None:
+            self.metadata['sampling'] = sampling
+
+    def _add_view_column(self, df, view_id):
+        if self._multi_view:
+            values = pd.array([str(view_id)] * len(df), dtype=str)
+            if self._categorical == 'auto' or \
+                    GoogleAnalyticsAPI._is_categorical('view_id', self._categorical):
+                values = pd.Categorical(values)
+            df.insert(0, 'view_id', values)
+        return df
+
+    def _fetch_range(self, i, start_date, end_date):
+        # bypasses the per-request cache, the incremental history replaces it
+        kwargs = self._query_kwargs(i)
+        kwargs.update(start_date=start_date, end_date=end_date)
+        body = self._client._build_body(**kwargs)
+        return self._client._fetch_frame(body, unsampled=self._unsampled)
+
+    def _fetch_incremental(self, i):
+        start = resolve_date(self._start_date)
+        end = resolve_date(self._end_date)
+
+        body = self._client._build_body(**self._query_kwargs(i))
+        del body['reportRequests'][0]['dateRanges']
+        key = 'incremental-' + body_key(body)
+
+        # the state lists the date ranges stored in the history so far
+        history, state = self._cache.load_state(key)
+        if history is None or state is None:
+            history, covered, date_column = None, [], None
+        else:
+            covered = [(resolve_date(s), resolve_date(e)) for s, e in state['ranges']]
+            date_column = state['date_column']
+
+        ranges = subtract_date_ranges(start, end, covered)
+        settled = resolve_date('today') - dt.timedelta(days=self._settle_days)
+        if covered and max(start, settled) <= end:
+            ranges = merge_date_ranges(ranges + [(max(start, settled), end)])
+
+        fetched_frames = [self._fetch_range(i, s, e) for s, e in ranges]
+        if history is None:
+            history = concat_frames(fetched_frames)
+            if history.empty:
+                return history
+            date_column = self._date_column(history)
+        elif fetched_frames:
+            days = history[date_column].dt.normalize()
+            keep = pd.Series(True, index=history.index)
+            for range_start, range_end in ranges:
+                keep &= ~days.between(pd.Timestamp(range_start), pd.Timestamp(range_end))
+            history = concat_frames([history[keep]] + fetched_frames)
+            history = history.sort_values(date_column, kind='stable', ignore_index=True)
+
+        if fetched_frames:
+            history.attrs = {}
+            covered = merge_date_ranges(covered + [(start, end)])
+            self._cache.store(key, history, state={
+                'date_column': date_column,
+                'ranges': [(as_day(s), as_day(e)) for s, e in covered]
+            })
+
+        days = history[date_column].dt.normalize()
+        df = history[days.between(pd.Timestamp(start), pd.Timestamp(end))].reset_index(drop=True)
+        df.attrs = {}
+        sampling = merge_sampling(f.attrs.get('sampling') for f in fetched_frames)
+        if sampling is not None:
+            df.attrs['sampling'] = sampling
+        return df
+
+    def _date_column(self, df):
+        for column in df.columns[:len(self._dimensions or [])]:
+            if is_datetime64_any_dtype(df[column]) and column not in MONTHLY_DIMENSIONS:
+                return column
+        raise ValueError('incremental=True requires a daily or finer date dimension, '
+                         'like ga:date, in dimensions')
+
     def _get_schema(self):
-        if self._df is None:
-            self._df = self._client.query(
-                view_id=self._view_id,
-                start_date=self._start_date, end_date=self._end_date,
-                metrics=self._metrics,
-                dimensions=self._dimensions,
-                filters=self._filters,
-            )
+        if self._partitions is None:
+            self._partitions = self._make_partitions()
+
+        if self._meta is None:
+            kwargs = self._query_kwargs(0)
+            kwargs.update(start_date=self._start_date, end_date=self._end_date)
+            del kwargs['page_size']
+            report = self._client.probe(**kwargs)
+            meta = self._client._frame(report).iloc[:0].copy()
+            meta = self._add_view_column(meta, self._views[0])
+            # the categories of the probed row are not those of the whole report
+            for column, dtype in meta.dtypes.items():
+                if isinstance(dtype, pd.CategoricalDtype):
+                    meta[column] = meta[column].cat.set_categories([])
+            meta.attrs = {}
+            self._meta = meta
+            if self._multi_view:
+                # only the first view is probed
+                self._row_count = None
+                self._probe_sampling = None
+            else:
+                self._row_count = report['data'].get('rowCount', 0)
+                self._probe_sampling = sampling_stats(report['data'])
+
+        # once data was fetched its sampling stats replace those of the probe
+        extra_metadata = {}
+        if not self._sampling:
+            extra_metadata['sampling'] = self._probe_sampling
 
         return Schema(datashape=None,
-                      dtype={k: str(v) for k,v in self._df.dtypes.items()},
-                      shape=(None, len(self._df.columns)),
-                      npartitions=1,
-                      extra_metadata={})
+                      dtype={k: str(v) for k, v in self._meta.dtypes.items()},
+                      shape=(self._row_count, len(self._meta.columns)),
+                      npartitions=len(self._partitions),
+                      extra_metadata=extra_metadata)
 
     def _get_partition(self, i):
-        self._get_schema()
-        return self._df
+        if self._partitions is None:
+            self._partitions = self._make_partitions()
+        if len(self._partitions) == 1:
+            if self._df is None:
+                self._df = self._fetch(0)
+            return self._df
+        return self._fetch(i)
+
+    def _read_partition(self, i, columns=None):
+        if columns is None:
+            return self._get_partition(i)
+        if len(self._partitions) == 1 and self._df is not None:
+            return self._df[list(columns)]
+        return self._fetch(i, columns=columns)
+
+    def read(self, parallel=None, columns=None):
+        """Load the whole report into one DataFrame
+
+        With ``parallel=N`` the report is fetched on ``N`` threads. When the
+        query has a daily or finer date dimension, such as ``ga:date``, the
+        date range of every partition is first split into ``N`` sub-ranges.
+        The slices are concatenated in date order.
+
+        ``columns`` selects the columns to return. Only the metrics among
+        them are requested from the API, see :meth:`_project_metrics`.
+        """
+        if self._partitions is None:
+            self._partitions = self._make_partitions()
+
+        if parallel is not None:
+            slices = [(i, date_range)
+                      for i in range(len(self._partitions))
+                      for date_range in self._split_partition(i, parallel)]
+            with ThreadPoolExecutor(max_workers=parallel) as pool:
+                df = concat_frames(pool.map(lambda s: self._fetch(*s, columns=columns), slices))
+            # the stats of earlier reads with other slices must not add up
+            self._update_sampling([i if r is None else (i, r) for i, r in slices])
+            return df
+
+        if len(self._partitions) == 1:
+            df = self._read_partition(0, columns)
+            # the frame may be the one kept from an earlier read
+            self._update_sampling([0])
+            return df
+        if self._multi_view:
+            with ThreadPoolExecutor(max_workers=self._max_concurrent_views) as pool:
+                return concat_frames(pool.map(lambda i: self._read_partition(i, columns),
+                                              range(len(self._partitions))))
+        return concat_frames([self._read_partition(i, columns)
+                              for i in range(len(self._partitions))])
+
+    def _split_partition(self, i, parts):
+        # rows of different date ranges only stay distinct with a daily date dimension
+        dimensions = [d['name'] if isinstance(d, dict) else d for d in self._dimensions or []]
+        if self._incremental or not any(d in DAILY_DIMENSIONS for d in dimensions):
+            return [None]
+        _, start_date, end_date = self._partitions[i]
+        return split_date_range(start_date, end_date, parts)
+
+    def _check_pages_unsampled(self, method):
+        # the pages of a report arrive before it is known whether it must be split
+        if self._unsampled:
+            raise ValueError(f'{method}() does not support unsampled=True, use read() instead')
+
+    def read_chunked(self):
+        """Yield one DataFrame per page of the report, partition by partition"""
+        self._check_pages_unsampled('read_chunked')
+        if self._partitions is None:
+            self._partitions = self._make_partitions()
+        for i in range(len(self._partitions)):
+            for df in self._client.iter_query(**self._query_kwargs(i)):
+                yield self._add_view_column(df, self._partitions[i][0])
+
+    def read_arrow(self):
+        """Load the report as a ``pyarrow.Table``, see ``GoogleAnalyticsAPI.query_arrow``"""
+        import pyarrow as pa
 
-    def read(self):
-        self._get_schema()
-        return self._df
+        self._check_pages_unsampled('read_arrow')
+        if self._partitions is None:
+            self._partitions = self._make_partitions()
+        tables = []
+        for i, (view_id, _, _) in enumerate(self._partitions):
+            table = self._client.query_arrow(**self._query_kwargs(i))
+            if self._multi_view:
+                views = pa.array([str(view_id)] * table.num_rows,
+                                 pa.dictionary(pa.int32(), pa.string()))
+                table = table.add_column(0, 'view_id', views)
+            tables.append(table)
+        return pa.concat_tables(tables)
 
     def to_dask(self):
-        raise NotImplementedError()
+        """One dask partition per partition of the source
+
+        A column selection on the result, like ``ds.to_dask()[['ga:date', 'ga:users']]``,
+        is pushed down into the requests with dask 2022.5.1 or later, see :meth:`read`.
+        """
+        import dask.dataframe as dd
+        from dask.dataframe.utils import clear_known_categories
+
+        self._load_metadata()
+        meta = clear_known_categories(self._meta)
+        if not hasattr(dd, 'from_map'):
+            # dask < 2022.5.1 cannot push column selections down
+            from dask import delayed
+            parts = [delayed(self._read_partition)(i) for i in range(self.npartitions)]
+            return dd.from_delayed(parts, meta=meta)
+        return dd.from_map(self._read_partition, range(self.npartitions),
+                           meta=meta, label='google-analytics')
 
     def _close(self):
         self._df = None
+        self._meta = None
+        self._partitions = None
+        self._sampling = {}
 
 
 class GoogleAnalyticsAPI(object):
-    def __init__(self, credentials_path):
+    """
+    Thin wrapper around the Reporting API v4 ``reports`` resource
+
+    When ``max_concurrent_pages`` is set, the pages that follow the first
+    response are requested concurrently on a thread pool of that size. The
+    v4 page tokens are row offsets, so all remaining tokens can be computed
+    once the first page reports ``rowCount``.
+
+    When a :class:`QueryCache` is given as ``cache``, :meth:`query` returns
+    stored results for request bodies it has already fetched.
+
+    No client is created until the first request is made.
+
+    Every request is retried according to ``retry``, a :class:`RetryPolicy`,
+    so a failing page does not discard the pages fetched before it. Pass
+    ``retry=None`` to disable retries.
+
+    ``rate_limit`` maps the scopes ``'project'`` and ``'view'`` to keyword
+    arguments for :class:`RateLimiter`. Limiters are shared by all instances
+    in the process that use the same Google Cloud project or ``viewId``.
+
+    With a ``checkpoint_dir`` every page after the first is written to disk
+    as it arrives. Running the same request again after a crash resumes
+    from the last stored page; the pages are removed once the request has
+    completed.
+
+    ``max_workers`` threads are used to fetch independent date ranges of one
+    query concurrently.
+
+    ``categorical`` controls which dimension columns are built as
+    ``pd.Categorical``: ``True`` for all of them, ``'auto'`` for the
+    ``CATEGORICAL_DIMENSIONS``, a list for the dimensions it names and
+    ``False`` for none. The choice only depends on the column name, so
+    every page and partition of a query gets the same dtypes. Date
+    dimensions are never categorical.
+    """
+
+    def __init__(self, credentials_path, max_concurrent_pages=None, cache=None,
+                 retry=RetryPolicy(), rate_limit=None, checkpoint_dir=None,
+                 max_workers=DEFAULT_MAX_WORKERS, categorical=False):
         self._credentials_path = credentials_path
-        self.client = self.create_client()
+        self._max_concurrent_pages = max_concurrent_pages
+        self._max_workers = max_workers
+        self._cache = cache
+        self._retry = retry
+        self._checkpoint_dir = checkpoint_dir
+
+        if not isinstance(categorical, (list, tuple)) and categorical not in CATEGORICAL_OPTIONS:
+            raise ValueError(f'{categorical} is not a supported categorical option.\n'
+                             f'Please use one of {", ".join(map(str, CATEGORICAL_OPTIONS))}')
+        self._categorical = categorical
+
+        rate_limit = rate_limit or {}
+        unknown = set(rate_limit) - set(RATE_LIMIT_SCOPES)
+        if unknown:
+            raise ValueError(f'{", ".join(sorted(unknown))} is not a supported rate limit scope.\n'
+                             f'Please use one of {", ".join(RATE_LIMIT_SCOPES)}')
+        self._rate_limit = rate_limit
+        self._local = threading.local()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    @property
+    def client(self):
+        """The reports resource for the calling thread, created on first use"""
+        return self._get_client()
 
     def create_client(self):
-        credentials = Credentials.from_service_account_file(self._credentials_path)
-        c = discovery.build('analyticsreporting', 'v4',
-                            credentials=credentials,
-                            cache_discovery=False).reports()
-        return c
+        return get_reports_resource(self._credentials_path)
+
+    def _get_client(self):
+        # the httplib2 transport is not thread-safe, so every thread
+        # gets its own reports resource, rebuilt after clients.clear()
+        generation = clients.generation()
+        client = getattr(self._local, 'client', None)
+        if client is None or self._local.generation != generation:
+            client = self._local.client = self.create_client()
+            self._local.generation = generation
+        return client
+
+    def _execute(self, body):
+        if self._retry is None:
+            return self._execute_once(body)
+        return self._retry.call(self._execute_once, body)
+
+    def _execute_once(self, body):
+        with ExitStack() as stack:
+            for limiter in self._limiters(body):
+                stack.enter_context(limiter)
+            return self._get_client().batchGet(body=body).execute()
+
+    def _limiters(self, body):
+        limiters = []
+        if 'project' in self._rate_limit:
+            project_id = get_credentials(self._credentials_path).project_id
+            limiters.append(get_limiter(('project', project_id), **self._rate_limit['project']))
+        if 'view' in self._rate_limit:
+            view_id = body['reportRequests'][0]['viewId']
+            limiters.append(get_limiter(('view', view_id), **self._rate_limit['view']))
+        return limiters
 
     def query(self, view_id: str, start_date: DateTypes, end_date: DateTypes,
-              metrics: list, dimensions: list = None, filters: list = None):
-        result = self._query(
+              metrics: list, dimensions: list = None, filters: list = None,
+              page_size: int = MAX_PAGE_SIZE, sampling_level: str = None,
+              unsampled: bool = False):
+        """Run a query and return the report as a DataFrame
+
+        With ``unsampled=True`` a single-row request checks whether the date
+        range is sampled. A sampled range is split in half, repeatedly, until
+        no sub-range is sampled, and only unsampled ranges are downloaded.
+        The sub-ranges are fetched concurrently on ``max_workers`` threads
+        and combined, see :meth:`_combine`.
+
+        More than ``MAX_METRICS`` metrics are split into several requests
+        with the same dimensions, see :meth:`_fetch_metric_chunks`.
+        """
+        body = self._build_body(
             view_id=view_id, start_date=start_date, end_date=end_date,
-            metrics=metrics, dimensions=dimensions, filters=filters
+            metrics=metrics, dimensions=dimensions, filters=filters,
+            page_size=page_size, sampling_level=sampling_level
         )
+        cache_key = self._cache_key(body, unsampled)
+
+        if self._cache is not None:
+            df = self._cache.get(cache_key)
+            if df is not None:
+                return df
+
+        df = self._fetch_frame(body, unsampled=unsampled)
 
-        df = self._to_dataframe(result)
+        if self._cache is not None:
+            self._cache.put(cache_key, df)
         return df
 
+    def _cache_key(self, body, unsampled=False):
+        # the options that change the returned frame but not the request
+        key = body
+        if unsampled:
+            key = dict(key, unsampled=True)
+        if self._categorical:
+            key = dict(key, categorical=self._categorical)
+        return key
+
+    def _fetch_frame(self, body, unsampled=False):
+        chunks = self._split_metrics(body)
+        if len(chunks) > 1:
+            return self._fetch_metric_chunks(chunks, unsampled=unsampled)
+        if unsampled:
+            reports = self._fetch_unsampled(body)
+            return self._combine(body['reportRequests'][0], reports)
+        return self._frame(self._fetch_reports(body)[0])
+
+    def _frame(self, report):
+        return self._to_dataframe(report, categorical=self._categorical)
+
+    @staticmethod
+    def _split_metrics(body):
+        """One body per ``MAX_METRICS`` metrics of the request, all with the same dimensions"""
+        request = body['reportRequests'][0]
+        metrics = request['metrics']
+        if len(metrics) <= MAX_METRICS:
+            return [body]
+        return [{'reportRequests': [dict(request, metrics=metrics[start:start + MAX_METRICS])]}
+                for start in range(0, len(metrics), MAX_METRICS)]
+
+    @staticmethod
+    def _pack(requests):
+        """Group reportRequests that share their batch fields into batchGet bodies"""
+        return [{'reportRequests': requests[start:start + MAX_REPORT_REQUESTS]}
+                for start in range(0, len(requests), MAX_REPORT_REQUESTS)]
+
+    @staticmethod
+    def _check_metric_count(body):
+        count = len(body['reportRequests'][0]['metrics'])
+        if count > MAX_METRICS:
+            raise ValueError(f'A request can contain at most {MAX_METRICS} metrics, got {count}.\n'
+                             f'Only query() splits the metrics over several requests.')
+
+    def _fetch_metric_chunks(self, chunks, unsampled=False):
+        """Fetch the metric chunks of one query and join them into one DataFrame
+
+        The chunks are packed up to five at a time into one ``batchGet``
+        and the batches are fetched concurrently on ``max_workers``
+        threads. With ``unsampled=True`` every chunk is fetched on its own,
+        since each may need different date ranges to avoid sampling.
+        """
+        with ThreadPoolExecutor(max_workers=self._max_workers) as pool:
+            if unsampled:
+                frames = list(pool.map(lambda chunk: self._fetch_frame(chunk, unsampled=True),
+                                       chunks))
+            else:
+                batches = self._pack([c['reportRequests'][0] for c in chunks])
+                frames = [self._frame(report)
+                          for reports in pool.map(self._fetch_reports, batches)
+                          for report in reports]
+
+        n_dimensions = len(chunks[0]['reportRequests'][0].get('dimensions', []))
+        dimensions = list(frames[0].columns[:n_dimensions])
+        return self._join_metrics(frames, dimensions)
+
+    @staticmethod
+    def _join_metrics(frames, dimensions):
+        """Join frames holding different metrics for the same dimensions
+
+        The rows keep the order of the first frame; rows missing from a
+        frame get 0 for its metrics.
+        """
+        sampling = merge_sampling(f.attrs.get('sampling') for f in frames)
+        if not dimensions:
+            df = pd.concat([f.reset_index(drop=True) for f in frames], axis=1)
+        else:
+            df = pd.concat([f.set_index(dimensions) for f in frames], axis=1, sort=False)
+            df = df.reset_index()
+            for frame in frames:
+                for column, dtype in frame.dtypes.items():
+                    if column in dimensions:
+                        if isinstance(dtype, pd.CategoricalDtype):
+                            df[column] = df[column].astype('category')
+                    elif df[column].hasnans:
+                        df[column] = df[column].fillna(0).astype(dtype)
+
+        df.attrs = {'sampling': sampling}
+        return df
+
+    def iter_query(self, view_id: str, start_date: DateTypes, end_date: DateTypes,
+                   metrics: list, dimensions: list = None, filters: list = None,
+                   page_size: int = MAX_PAGE_SIZE, sampling_level: str = None):
+        """Yield the result of a query as one DataFrame per page
+
+        Pages are requested one at a time as the generator advances, so only
+        a single page is held in memory.
+        """
+        body = self._build_body(
+            view_id=view_id, start_date=start_date, end_date=end_date,
+            metrics=metrics, dimensions=dimensions, filters=filters,
+            page_size=page_size, sampling_level=sampling_level
+        )
+        self._check_metric_count(body)
+
+        expected_rows = None
+        gathered_rows = 0
+        for report in self._iter_pages(body):
+            if expected_rows is None:
+                expected_rows = report['data'].get('rowCount', 0)
+            df = self._frame(report)
+            gathered_rows += len(df)
+            yield df
+
+        if expected_rows:
+            self._check_row_count(expected_rows, gathered_rows)
+
+    def query_arrow(self, view_id: str, start_date: DateTypes, end_date: DateTypes,
+                    metrics: list, dimensions: list = None, filters: list = None,
+                    page_size: int = MAX_PAGE_SIZE, sampling_level: str = None):
+        """Run a query and return the report as a ``pyarrow.Table``
+
+        Every page is converted to Arrow as soon as it arrives. Dimension
+        columns are dictionary encoded, metric and date columns get their
+        final type, so ``table.to_pandas()`` does not need to copy the
+        metric columns and turns dimensions into categoricals.
+        """
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError('query_arrow requires pyarrow.')
+
+        body = self._build_body(
+            view_id=view_id, start_date=start_date, end_date=end_date,
+            metrics=metrics, dimensions=dimensions, filters=filters,
+            page_size=page_size, sampling_level=sampling_level
+        )
+        self._check_metric_count(body)
+
+        tables = []
+        expected_rows = None
+        date_formats = None
+        for report in self._iter_pages(body):
+            if expected_rows is None:
+                expected_rows = report['data'].get('rowCount', 0)
+                date_formats = self._date_formats(report)
+            tables.append(self._to_arrow(report, date_formats))
+
+        table = pa.concat_tables(tables)
+        if expected_rows:
+            self._check_row_count(expected_rows, table.num_rows)
+        return table
+
+    def probe(self, view_id: str, start_date: DateTypes, end_date: DateTypes,
+              metrics: list, dimensions: list = None, filters: list = None,
+              sampling_level: str = None):
+        """Request a single row of a query
+
+        The returned report holds the ``columnHeader`` and the total
+        ``rowCount`` without downloading the data.
+        """
+        body = self._build_body(
+            view_id=view_id, start_date=start_date, end_date=end_date,
+            metrics=metrics, dimensions=dimensions, filters=filters,
+            page_size=1, sampling_level=sampling_level
+        )
+        requests = [c['reportRequests'][0] for c in self._split_metrics(body)]
+        reports = [report for batch in self._pack(requests)
+                   for report in self._execute(batch)['reports']]
+        if len(reports) == 1:
+            return reports[0]
+        return self._merge_probes(reports)
+
+    @staticmethod
+    def _merge_probes(reports):
+        """Merge the probes of the metric chunks of a query into one report"""
+        report = copy.deepcopy(reports[0])
+        entries = report['columnHeader']['metricHeader']['metricHeaderEntries']
+        data = report['data']
+        first_rows = [(r['data'].get('rows') or [None])[0] for r in reports]
+
+        for other in reports[1:]:
+            entries.extend(other['columnHeader']['metricHeader']['metricHeaderEntries'])
+            other_data = other['data']
+            data['rowCount'] = max(data.get('rowCount', 0), other_data.get('rowCount', 0))
+            for key in ['samplesReadCounts', 'samplingSpaceSizes']:
+                if key in other_data:
+                    data[key] = data.get(key, []) + other_data[key]
+            if 'isDataGolden' in data or 'isDataGolden' in other_data:
+                data['isDataGolden'] = all(d.get('isDataGolden', False)
+                                           for d in (data, other_data))
+
+        if all(row is not None and row.get('dimensions') == first_rows[0].get('dimensions')
+               for row in first_rows):
+            data['rows'] = [{
+                'dimensions': first_rows[0].get('dimensions', []),
+                'metrics': [{'values': [v for row in first_rows
+                                        for v in row['metrics'][0]['values']]}]
+            }]
+        else:
+            # the single rows of the chunks do not line up, keep only the headers
+            data.pop('rows', None)
+        return report
+
+    def plan_partitions(self, view_id: str, start_date: DateTypes, end_date: DateTypes,
+                        metrics: list, dimensions: list = None, filters: list = None,
+                        sampling_level: str = None,
+                        rows_per_partition: int = DEFAULT_ROWS_PER_PARTITION):
+        """Split a date range into consecutive ranges of about ``rows_per_partition`` rows
+
+        A single-row :meth:`probe` reads the ``rowCount`` of a range. A range
+        with more rows is split into as many equal parts as the count
+        suggests and its parts are probed again, down to single days. The
+        probes of one round run concurrently on ``max_workers`` threads.
+        Neighbouring ranges are merged again while their counts add up to
+        at most ``rows_per_partition``.
+
+        Only queries with a daily or finer date dimension, such as
+        ``ga:date``, are split. The rows of other queries repeat in every
+        range, so they get the whole range without probing.
+
+        Returns a list of ``(start, end)`` tuples of ``datetime.date``.
+        """
+        if rows_per_partition < 1:
+            raise ValueError(f'rows_per_partition must be at least 1, got {rows_per_partition}')
+
+        def count(date_range):
+            report = self.probe(view_id=view_id, start_date=date_range[0], end_date=date_range[1],
+                                metrics=metrics, dimensions=dimensions, filters=filters,
+                                sampling_level=sampling_level)
+            return report['data'].get('rowCount', 0)
+
+        start, end = resolve_date(start_date), resolve_date(end_date)
+        if start > end:
+            raise ValueError(f'start_date {start} is after end_date {end}')
+
+        names = [d['name'] if isinstance(d, dict) else d for d in dimensions or []]
+        if not any(d in DAILY_DIMENSIONS for d in names):
+            return [(start, end)]
+
+        counts = {}
+        pending = [(start, end)]
+        with ThreadPoolExecutor(max_workers=self._max_workers) as pool:
+            while pending:
+                split = []
+                for (start, end), rows in zip(pending, pool.map(count, pending)):
+                    if rows > rows_per_partition and start < end:
+                        split.extend(split_date_range(start, end, -(-rows // rows_per_partition)))
+                    else:
+                        counts[(start, end)] = rows
+                pending = split
+
+        # the count of a merged range is at most the sum of its parts
+        ranges = []
+        for date_range in sorted(counts):
+            rows = counts[date_range]
+            if ranges and ranges[-1][1] + rows <= rows_per_partition:
+                (merged_start, _), merged_rows = ranges.pop()
+                date_range, rows = (merged_start, date_range[1]), merged_rows + rows
+            ranges.append((date_range, rows))
+
+        return [date_range for date_range, _ in ranges]
+
+    def query_many(self, queries: list):
+        """Run several queries with as few batchGet calls as possible
+
+        Each element of ``queries`` is a dict of keyword arguments for
+        :meth:`query`, out of ``QUERY_MANY_ARGUMENTS``; ``unsampled`` is not
+        supported. Queries that share a view, date range and sampling level
+        are packed up to five at a time into one ``batchGet`` call.
+        Returns one DataFrame per query, in the order given.
+        """
+        for q in queries:
+            unknown = set(q) - set(QUERY_MANY_ARGUMENTS)
+            if unknown:
+                raise ValueError(f'{", ".join(sorted(unknown))} is not supported by query_many().\n'
+                                 f'Please use only {", ".join(QUERY_MANY_ARGUMENTS)}')
+
+        bodies = [self._build_body(**q) for q in queries]
+        for body in bodies:
+            self._check_metric_count(body)
+        requests = [body['reportRequests'][0] for body in bodies]
+
+        groups = OrderedDict()
+        for i, request in enumerate(requests):
+            groups.setdefault(self._batch_key(request), []).append(i)
+
+        dfs = [None] * len(requests)
+        for indices in groups.values():
+            for start in range(0, len(indices), MAX_REPORT_REQUESTS):
+                batch = indices[start:start + MAX_REPORT_REQUESTS]
+                body = {'reportRequests': [requests[i] for i in batch]}
+                for i, report in zip(batch, self._fetch_reports(body)):
+                    dfs[i] = self._frame(report)
+
+        return dfs
+
+    @staticmethod
+    def _batch_key(request):
+        # all reportRequests in one batchGet must agree on these fields
+        return json.dumps({k: request.get(k) for k in BATCH_KEYS}, sort_keys=True)
+
     def _build_body(self, view_id: str, start_date: DateTypes, end_date: DateTypes, metrics: list,
-              dimensions: list = None, filters: list = None):
+              dimensions: list = None, filters: list = None, page_size: int = MAX_PAGE_SIZE,
+              sampling_level: str = None):
 
         date_range = {
             'startDate': self._parse_date(start_date),
@@ -139,77 +981,458 @@ class GoogleAnalyticsAPI(object):
         if filters:
             request['filtersExpression'] = filters
 
+        if page_size is not None:
+            if not 0 < page_size <= MAX_PAGE_SIZE:
+                raise ValueError(f'page_size must be between 1 and {MAX_PAGE_SIZE}, '
+                                 f'got {page_size}')
+            request['pageSize'] = page_size
+
+        if sampling_level is not None:
+            if sampling_level not in SAMPLING_LEVELS:
+                raise ValueError(f'{sampling_level} is not a supported sampling level.\n'
+                                 f'Please use one of {", ".join(SAMPLING_LEVELS)}')
+            request['samplingLevel'] = sampling_level
+
         body = {'reportRequests': [request]}
         return body
 
     def _query(self, view_id: str, start_date: DateTypes, end_date: DateTypes, metrics: list,
-              dimensions: list = None, filters: list = None):
+              dimensions: list = None, filters: list = None, page_size: int = MAX_PAGE_SIZE,
+              sampling_level: str = None):
 
         body = self._build_body(
             view_id=view_id, start_date=start_date, end_date=end_date,
-            metrics=metrics, dimensions=dimensions, filters=filters
+            metrics=metrics, dimensions=dimensions, filters=filters,
+            page_size=page_size, sampling_level=sampling_level
         )
 
-        result = self.client.batchGet(body=body).execute()
+        return self._fetch_reports(body)[0]
+
+    def _fetch_reports(self, body):
+        result = self._execute(body)
+        return [self._paginate(request, report)
+                for request, report in zip(body['reportRequests'], result['reports'])]
 
-        report = result['reports'][0]
+    def _paginate(self, request, report):
         expected_rows = report['data'].get('rowCount', 0)
         if expected_rows == 0:
             return report
 
-        while result['reports'][0].get('nextPageToken'):
-            body['reportRequests'][0]['pageToken'] = result['reports'][0].get('nextPageToken')
-            result = self.client.batchGet(body=body).execute()
-            report['data']['rows'].extend(result['reports'][0]['data']['rows'])
+        # remaining pages are always requested one reportRequest at a time
+        body = {'reportRequests': [copy.deepcopy(request)]}
+
+        page_token = report.get('nextPageToken')
+        if page_token and self._max_concurrent_pages and str(page_token).isdigit():
+            page_size = len(report['data']['rows'])
+            page_tokens = [str(offset) for offset in range(page_size, expected_rows, page_size)]
+
+            page_bodies = []
+            for token in page_tokens:
+                page_body = copy.deepcopy(body)
+                page_body['reportRequests'][0]['pageToken'] = token
+                page_bodies.append(page_body)
+
+            with ThreadPoolExecutor(max_workers=self._max_concurrent_pages) as pool:
+                for page in pool.map(self._fetch_page, page_bodies):
+                    report['data']['rows'].extend(page['data']['rows'])
+
+            if self._checkpoint_dir is not None:
+                for page_body in page_bodies:
+                    self._checkpoint(page_body).remove()
+        elif page_token:
+            body['reportRequests'][0]['pageToken'] = page_token
+            for page in self._iter_pages(body):
+                report['data']['rows'].extend(page['data']['rows'])
 
-        gathered_rows = len(report['data']['rows'])
+        self._check_row_count(expected_rows, len(report['data']['rows']))
+        return report
+
+    @staticmethod
+    def _check_row_count(expected_rows, gathered_rows):
         if gathered_rows != expected_rows:
             raise RuntimeError(f'The query was expected to return {expected_rows} rows, '
                                f'but {gathered_rows} rows were retrieved.')
 
+    def _iter_pages(self, body):
+        """Yield the report of every page for a single-request body
+
+        With a checkpoint directory, pages stored by an earlier run of the
+        same body are replayed before any new request is made.
+        """
+        body = copy.deepcopy(body)
+        request = body['reportRequests'][0]
+        checkpoint = self._checkpoint(body)
+
+        if checkpoint is not None:
+            # the stored pages are loaded one at a time as they are yielded
+            report = None
+            for page_token, filename in checkpoint.pages():
+                if report is None and page_token != request.get('pageToken'):
+                    # left over from a run that started at a different page
+                    checkpoint.remove()
+                    break
+                report = checkpoint.load(filename)
+                yield report
+
+            if report is not None:
+                request['pageToken'] = report['nextPageToken']
+
+        while True:
+            report = self._execute(body)['reports'][0]
+            page_token = report.get('nextPageToken')
+            if checkpoint is not None:
+                if page_token:
+                    checkpoint.add(request.get('pageToken'), report)
+                else:
+                    checkpoint.remove()
+            yield report
+
+            if not page_token:
+                break
+            request['pageToken'] = page_token
+
+    def _fetch_page(self, body):
+        """The first page for a single-request body, stored in a checkpoint if enabled"""
+        checkpoint = self._checkpoint(body)
+        if checkpoint is None:
+            return self._execute(body)['reports'][0]
+
+        for _, filename in checkpoint.pages():
+            return checkpoint.load(filename)
+
+        report = self._execute(body)['reports'][0]
+        checkpoint.add(body['reportRequests'][0].get('pageToken'), report)
+        return report
+
+    def _checkpoint(self, body):
+        if self._checkpoint_dir is None:
+            return None
+        return Checkpoint(self._checkpoint_dir, body)
+
+    @staticmethod
+    def _is_sampled(report):
+        return sampling_stats(report['data'])['sampled']
+
+    def _fetch_unsampled(self, body):
+        """Fetch a single-request body as unsampled reports, in date order"""
+        date_range = body['reportRequests'][0]['dateRanges'][0]
+        pending = [(resolve_date(date_range['startDate']), resolve_date(date_range['endDate']))]
+
+        def fetch(date_range):
+            start, end = date_range
+            range_body = copy.deepcopy(body)
+            range_body['reportRequests'][0]['dateRanges'] = [
+                {'startDate': as_day(start), 'endDate': as_day(end)}]
+
+            # a single-row probe tells whether the range is sampled, only
+            # ranges that are kept are downloaded
+            probe_body = copy.deepcopy(range_body)
+            probe_body['reportRequests'][0]['pageSize'] = 1
+            if self._is_sampled(self._execute(probe_body)['reports'][0]):
+                if start < end:
+                    return None
+                warnings.warn(f'The report for {as_day(start)} is sampled even for a single day.')
+
+            report = self._execute(range_body)['reports'][0]
+            return self._paginate(range_body['reportRequests'][0], report)
+
+        reports = {}
+        with ThreadPoolExecutor(max_workers=self._max_workers) as pool:
+            while pending:
+                split = []
+                for (start, end), report in zip(pending, pool.map(fetch, pending)):
+                    if report is None:
+                        middle = start + (end - start) // 2
+                        split.extend([(start, middle), (middle + dt.timedelta(days=1), end)])
+                    else:
+                        reports[start] = report
+                pending = split
+
+        return [reports[start] for start in sorted(reports)]
+
+    def _combine(self, request, reports):
+        """Combine reports for consecutive date ranges into one DataFrame
+
+        Rows of different ranges never overlap when the query has a daily
+        or finer date dimension, so the frames are concatenated. Otherwise
+        the rows are summed per dimension values, which requires every
+        metric to be additive.
+        """
+        df = concat_frames([self._frame(r) for r in reports])
+        sampling = merge_sampling(sampling_stats(r['data']) for r in reports)
+        df.attrs['sampling'] = sampling
+        if len(reports) == 1:
+            return df
+
+        dimensions = [d['name'] for d in request.get('dimensions', [])]
+        if any(d in DAILY_DIMENSIONS for d in dimensions):
+            return df
+
+        header = reports[0]['columnHeader']['metricHeader']['metricHeaderEntries']
+        not_additive = [
+            m['expression'] for m, h in zip(request['metrics'], header)
+            if h['type'] not in ADDITIVE_TYPES or m['expression'] in NON_ADDITIVE_METRICS
+        ]
+        if not_additive:
+            raise ValueError(f'The unsampled report was split into {len(reports)} date ranges, '
+                             f'but {", ".join(not_additive)} cannot be summed across them.\n'
+                             f'Add a date dimension like ga:date to the query instead.')
+
+        if dimensions:
+            df = df.groupby(dimensions, sort=False, as_index=False).sum()
+        else:
+            df = df.sum().to_frame().T.astype(df.dtypes)
+        df.attrs['sampling'] = sampling
+        return df
+
+    async def aquery(self, view_id: str, start_date: DateTypes, end_date: DateTypes,
+                     metrics: list, dimensions: list = None, filters: list = None,
+                     page_size: int = MAX_PAGE_SIZE, sampling_level: str = None,
+                     session=None):
+        """Coroutine version of :meth:`query`
+
+        Requests are sent with aiohttp, so many queries can run concurrently
+        on one event loop. Converting the report to a DataFrame and the
+        optional cache run in the default executor. Pass an
+        ``aiohttp.ClientSession`` as ``session`` to share its connection pool
+        between queries.
+        """
+        body = self._build_body(
+            view_id=view_id, start_date=start_date, end_date=end_date,
+            metrics=metrics, dimensions=dimensions, filters=filters,
+            page_size=page_size, sampling_level=sampling_level
+        )
+        self._check_metric_count(body)
+        loop = asyncio.get_running_loop()
+        cache_key = self._cache_key(body)
+
+        if self._cache is not None:
+            df = await loop.run_in_executor(None, self._cache.get, cache_key)
+            if df is not None:
+                return df
+
+        async with self._asession(session) as session:
+            report = await self._apaginate(body, session)
+        df = await loop.run_in_executor(None, self._frame, report)
+
+        if self._cache is not None:
+            await loop.run_in_executor(None, self._cache.put, cache_key, df)
+        return df
+
+    async def aiter_query(self, view_id: str, start_date: DateTypes, end_date: DateTypes,
+                          metrics: list, dimensions: list = None, filters: list = None,
+                          page_size: int = MAX_PAGE_SIZE, sampling_level: str = None,
+                          session=None):
+        """Async generator version of :meth:`iter_query`"""
+        body = self._build_body(
+            view_id=view_id, start_date=start_date, end_date=end_date,
+            metrics=metrics, dimensions=dimensions, filters=filters,
+            page_size=page_size, sampling_level=sampling_level
+        )
+        self._check_metric_count(body)
+        loop = asyncio.get_running_loop()
+
+        expected_rows = None
+        gathered_rows = 0
+        async with self._asession(session) as session:
+            async for report in self._aiter_pages(body, session):
+                if expected_rows is None:
+                    expected_rows = report['data'].get('rowCount', 0)
+                df = await loop.run_in_executor(None, self._frame, report)
+                gathered_rows += len(df)
+                yield df
+
+        if expected_rows:
+            self._check_row_count(expected_rows, gathered_rows)
+
+    @asynccontextmanager
+    async def _asession(self, session=None):
+        if session is not None:
+            yield session
+            return
+
+        try:
+            import aiohttp
+        except ImportError:
+            raise ImportError('The async query API requires aiohttp.')
+
+        async with aiohttp.ClientSession() as session:
+            yield session
+
+    async def _apaginate(self, body, session):
+        report = (await self._aexecute(body, session))['reports'][0]
+        expected_rows = report['data'].get('rowCount', 0)
+        if expected_rows == 0:
+            return report
+
+        body = copy.deepcopy(body)
+        page_token = report.get('nextPageToken')
+        if page_token and self._max_concurrent_pages and str(page_token).isdigit():
+            page_size = len(report['data']['rows'])
+            page_tokens = [str(offset) for offset in range(page_size, expected_rows, page_size)]
+            semaphore = asyncio.Semaphore(self._max_concurrent_pages)
+
+            async def fetch(token):
+                page_body = copy.deepcopy(body)
+                page_body['reportRequests'][0]['pageToken'] = token
+                async with semaphore:
+                    return await self._aexecute(page_body, session)
+
+            for result in await asyncio.gather(*[fetch(t) for t in page_tokens]):
+                report['data']['rows'].extend(result['reports'][0]['data']['rows'])
+        elif page_token:
+            body['reportRequests'][0]['pageToken'] = page_token
+            async for page in self._aiter_pages(body, session):
+                report['data']['rows'].extend(page['data']['rows'])
+
+        self._check_row_count(expected_rows, len(report['data']['rows']))
         return report
 
+    async def _aiter_pages(self, body, session):
+        body = copy.deepcopy(body)
+        while True:
+            report = (await self._aexecute(body, session))['reports'][0]
+            yield report
+
+            page_token = report.get('nextPageToken')
+            if not page_token:
+                break
+            body['reportRequests'][0]['pageToken'] = page_token
+
+    async def _aexecute(self, body, session):
+        if self._retry is None:
+            return await self._aexecute_once(body, session)
+        return await self._retry.acall(self._aexecute_once, body, session)
+
+    async def _aexecute_once(self, body, session):
+        import aiohttp
+
+        async with AsyncExitStack() as stack:
+            for limiter in self._limiters(body):
+                await stack.enter_async_context(limiter)
+
+            headers = await self._aauth_headers()
+            try:
+                async with session.post(BATCH_GET_URL, json=body, headers=headers) as response:
+                    status = response.status
+                    content = await response.read()
+            except aiohttp.ClientConnectionError as e:
+                raise ConnectionError(str(e)) from e
+            except asyncio.TimeoutError as e:
+                # not the built-in TimeoutError before Python 3.11
+                raise TimeoutError(str(e)) from e
+
+        if status >= 400:
+            raise HttpError(httplib2.Response({'status': status}), content, uri=BATCH_GET_URL)
+        return json.loads(content)
+
+    async def _aauth_headers(self):
+        credentials = get_credentials(self._credentials_path)
+        if not credentials.valid:
+            # token refresh is a blocking request, keep it off the event loop
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, credentials.refresh, AuthRequest())
+
+        headers = {}
+        credentials.apply(headers)
+        return headers
+
     @staticmethod
-    def _to_dataframe(report, parse_dates=True):
+    def _to_dataframe(report, parse_dates=True, categorical=False):
         headers = report['columnHeader']
 
-        columns = headers.get('dimensions', [])
+        dimension_columns = headers.get('dimensions', [])
         metric_columns = headers['metricHeader']['metricHeaderEntries']
+        rows = report['data'].get('rows', [])
+        date_columns = GoogleAnalyticsAPI._date_formats(report) if parse_dates else {}
 
-        dtypes = {}
-        for c in metric_columns:
-            name = c['name']
-            columns.append(name)
-            dtypes[name] = DTYPES[c['type']]
+        # build one array per column straight from the row payload, with each
+        # metric array created at its final dtype
+        arrays = []
+        for j, name in enumerate(dimension_columns):
+            # object arrays keep empty dimension columns as object, like the row-wise build
+            values = np.array([row['dimensions'][j] for row in rows], dtype=object)
+            if name in date_columns:
+                values = parse_date_values(values, date_columns[name])
+            elif GoogleAnalyticsAPI._is_categorical(name, categorical):
+                codes, categories = pd.factorize(values)
+                values = pd.Categorical.from_codes(codes, categories=categories)
+            arrays.append(values)
 
-        data = []
+        empty_metrics = [{'values': [0] * len(metric_columns)}]
+        metric_values = [row.get('metrics', empty_metrics)[0]['values'] for row in rows]
+        arrays.extend(np.array([values[j] for values in metric_values], dtype=DTYPES[c['type']])
+                      for j, c in enumerate(metric_columns))
+
+        df = pd.DataFrame(dict(enumerate(arrays)))
+        df.columns = dimension_columns + [c['name'] for c in metric_columns]
+        df.attrs['sampling'] = sampling_stats(report['data'])
+        return df
+
+    @staticmethod
+    def _is_categorical(name, categorical):
+        if categorical is True:
+            return True
+        if categorical == 'auto':
+            return name in CATEGORICAL_DIMENSIONS
+        if isinstance(categorical, (list, tuple)):
+            return name in categorical
+        return False
+
+    @staticmethod
+    def _date_formats(report):
+        """The date format of each date dimension of a report
+
+        Known GA date dimensions are looked up in ``DATE_DIMENSIONS`` and the
+        ``NON_DATE_DIMENSIONS`` are never dates. Any other dimension is a
+        date when its first value matches one of ``DATETIME_FORMATS``.
+        """
+        dimensions = report['columnHeader'].get('dimensions', [])
         rows = report['data'].get('rows', [])
-        for row in rows:
+        first_row = rows[0].get('dimensions', []) if rows else [None] * len(dimensions)
 
-            dim_values = row.get('dimensions', [])
+        formats = {}
+        for name, value in zip(dimensions, first_row):
+            if name in DATE_DIMENSIONS:
+                formats[name] = DATE_DIMENSIONS[name]
+                continue
+            if value is None or name in NON_DATE_DIMENSIONS:
+                continue
+            for format, regex in DATETIME_FORMATS.items():
+                if regex.fullmatch(value):
+                    formats[name] = format
+                    break  # continue to next column
+        return formats
 
-            this_row = []
-            metric_values = row.get('metrics', [{'values': [0] * len(metric_columns)}])[0]['values']
+    @staticmethod
+    def _to_arrow(report, date_formats=None):
+        import pyarrow as pa
 
-            this_row.extend(dim_values)
-            this_row.extend(metric_values)
+        if date_formats is None:
+            date_formats = GoogleAnalyticsAPI._date_formats(report)
 
-            data.append(this_row)
+        headers = report['columnHeader']
+        dimension_columns = headers.get('dimensions', [])
+        metric_columns = headers['metricHeader']['metricHeaderEntries']
+        rows = report['data'].get('rows', [])
 
-        df = pd.DataFrame(data=data, columns=columns)
-        for c, dtype in dtypes.items():
-            df[c] = df[c].astype(dtype)
+        arrays = []
+        for j, name in enumerate(dimension_columns):
+            values = [row['dimensions'][j] for row in rows]
+            if name in date_formats:
+                arrays.append(pa.array(parse_date_values(values, date_formats[name])))
+            else:
+                arrays.append(pa.array(values, pa.dictionary(pa.int32(), pa.string())))
 
-        if df.any(axis=None) and parse_dates:
-            first_row = df.iloc[[0]]
-            string_columns = first_row.dtypes[first_row.dtypes.apply(is_string_dtype)].index
-            for column in string_columns:
-                for format, regex in DATETIME_FORMATS.items():
-                    if first_row[column].str.fullmatch(regex).all():
-                        df[column] = pd.to_datetime(df[column], format=format)
-                        break  # continue to next column
+        empty_metrics = [{'values': [0] * len(metric_columns)}]
+        metric_values = [row.get('metrics', empty_metrics)[0]['values'] for row in rows]
+        arrays.extend(
+            pa.array(np.array([values[j] for values in metric_values], dtype=DTYPES[c['type']]))
+            for j, c in enumerate(metric_columns)
+        )
 
-        return df
+        names = dimension_columns + [c['name'] for c in metric_columns]
+        return pa.Table.from_arrays(arrays, names=names)
 
     @staticmethod
     def _parse_fields(fields, style):
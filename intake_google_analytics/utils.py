@@ -1,5 +1,20 @@
 import datetime as dt
+import hashlib
+import json
+import re
+
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
+
+PARTITION_FREQUENCIES = {
+    'day': 'D',
+    'week': 'W',
+    'month': 'M'
+}
+
+# number of digits of each field of a GA date value
+DATE_FIELD_WIDTHS = {'%Y': 4, '%m': 2, '%d': 2, '%H': 2, '%M': 2}
 
 
 def as_day(timestamp):
@@ -8,3 +23,184 @@ def as_day(timestamp):
 
 def is_dt(value):
     return isinstance(value, (dt.datetime, dt.date, pd.Timestamp))
+
+
+def body_key(body):
+    """Canonical hash of a batchGet request body"""
+    canonical = json.dumps(body, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def resolve_date(value, today=None):
+    """Convert a GA date value into a concrete ``datetime.date``
+
+    Relative values like ``'yesterday'`` and ``'NDaysAgo'`` are computed
+    from ``today``, which defaults to the current local date.
+    """
+    if today is None:
+        today = dt.date.today()
+
+    if isinstance(value, (dt.datetime, pd.Timestamp)):
+        return value.date()
+    elif isinstance(value, dt.date):
+        return value
+    elif value == 'today':
+        return today
+    elif value == 'yesterday':
+        return today - dt.timedelta(days=1)
+
+    match = re.fullmatch(r'(\d+)DaysAgo', value)
+    if match:
+        return today - dt.timedelta(days=int(match.group(1)))
+
+    return dt.datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def date_ranges(start_date, end_date, partition_by):
+    """Split the inclusive range ``start_date``..``end_date`` into sub-ranges
+
+    Each sub-range covers one calendar ``'day'``, ``'week'`` (Monday to Sunday)
+    or ``'month'``, clipped to the requested range. Returns a list of
+    ``(start, end)`` tuples of ``datetime.date``.
+    """
+    if partition_by not in PARTITION_FREQUENCIES:
+        raise ValueError(f'{partition_by} is not a supported partition frequency.\n'
+                         f'Please use one of {", ".join(PARTITION_FREQUENCIES)}')
+
+    start = resolve_date(start_date)
+    end = resolve_date(end_date)
+    if start > end:
+        raise ValueError(f'start_date {start} is after end_date {end}')
+
+    periods = pd.period_range(start, end, freq=PARTITION_FREQUENCIES[partition_by])
+    return [
+        (max(p.start_time.date(), start), min(p.end_time.date(), end))
+        for p in periods
+    ]
+
+
+def split_date_range(start_date, end_date, n):
+    """Split the inclusive range ``start_date``..``end_date`` into ``n`` consecutive parts
+
+    The parts differ in length by at most one day. Fewer parts are returned
+    when the range has less than ``n`` days.
+    """
+    start = resolve_date(start_date)
+    end = resolve_date(end_date)
+    if start > end:
+        raise ValueError(f'start_date {start} is after end_date {end}')
+
+    days = (end - start).days + 1
+    n = max(1, min(n, days))
+    bounds = [start + dt.timedelta(days=days * k // n) for k in range(n + 1)]
+    return [(bounds[k], bounds[k + 1] - dt.timedelta(days=1)) for k in range(n)]
+
+
+def merge_date_ranges(ranges):
+    """Merge overlapping or adjacent ``(start, end)`` date ranges, sorted by start"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + dt.timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_date_ranges(start, end, ranges):
+    """The parts of ``start``..``end`` not covered by any of ``ranges``"""
+    missing = []
+    for covered_start, covered_end in merge_date_ranges(ranges):
+        if covered_end < start or covered_start > end:
+            continue
+        if covered_start > start:
+            missing.append((start, covered_start - dt.timedelta(days=1)))
+        start = covered_end + dt.timedelta(days=1)
+    if start <= end:
+        missing.append((start, end))
+    return missing
+
+
+def sampling_stats(data):
+    """Summarize the sampling metadata of the ``data`` field of a report"""
+    samples_read = sum(int(v) for v in data.get('samplesReadCounts', []))
+    sampling_space = sum(int(v) for v in data.get('samplingSpaceSizes', []))
+    return {
+        'sampled': 'samplesReadCounts' in data or 'samplingSpaceSizes' in data,
+        'samples_read': samples_read,
+        'sampling_space': sampling_space,
+        'is_data_golden': bool(data.get('isDataGolden', False))
+    }
+
+
+def merge_sampling(stats):
+    """Combine the ``sampling_stats`` of several reports"""
+    stats = [s for s in stats if s]
+    if not stats:
+        return None
+    return {
+        'sampled': any(s['sampled'] for s in stats),
+        'samples_read': sum(s['samples_read'] for s in stats),
+        'sampling_space': sum(s['sampling_space'] for s in stats),
+        'is_data_golden': all(s['is_data_golden'] for s in stats)
+    }
+
+
+def concat_frames(frames):
+    """Concatenate DataFrames, keeping categorical columns categorical
+
+    ``pd.concat`` falls back to object columns when the categories of the
+    frames differ, so the categories are unified first.
+    """
+    frames = list(frames)
+    if len(frames) > 1:
+        categorical = [c for c in frames[0].columns
+                       if all(isinstance(f[c].dtype, pd.CategoricalDtype) for f in frames)]
+        for column in categorical:
+            categories = union_categoricals([f[column] for f in frames]).categories
+            frames = [f.assign(**{column: f[column].cat.set_categories(categories)})
+                      for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def parse_date_values(values, format):
+    """Parse GA date values like ``'2020031913'`` into ``datetime64[us]``
+
+    ``format`` is a concatenation of ``%Y``, ``%m``, ``%d``, ``%H`` and
+    ``%M``. Every distinct value is converted once, with integer arithmetic
+    on its digits, and the result is broadcast back to all rows.
+    """
+    fields = re.findall(r'%[YmdHM]', format)
+    if ''.join(fields) != format or fields[:1] != ['%Y']:
+        raise ValueError(f'{format} is not a supported date format')
+
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    uniques = np.asarray(uniques, dtype=str)
+
+    width = sum(DATE_FIELD_WIDTHS[f] for f in fields)
+    invalid = np.char.str_len(uniques) != width
+    if not invalid.any():
+        try:
+            numbers = uniques.astype(np.int64)
+        except ValueError:
+            invalid = np.ones(len(uniques), dtype=bool)
+
+    if not invalid.any():
+        parts = {'%m': 1, '%d': 1, '%H': 0, '%M': 0}
+        for field in reversed(fields):
+            numbers, parts[field] = np.divmod(numbers, 10 ** DATE_FIELD_WIDTHS[field])
+
+        months = ((parts['%Y'] - 1970) * 12 + parts['%m'] - 1).astype('datetime64[M]')
+        days = months.astype('datetime64[D]') + (parts['%d'] - 1)
+        minutes = np.asarray(parts['%H'] * 60 + parts['%M'], dtype='timedelta64[m]')
+        parsed = days.astype('datetime64[us]') + minutes
+
+        # a day past the end of its month rolls over into the next one
+        invalid = (parts['%m'] < 1) | (parts['%m'] > 12) | (parts['%d'] < 1)
+        invalid |= days.astype('datetime64[M]') != months
+        invalid |= (parts['%H'] > 23) | (parts['%M'] > 59)
+
+    if invalid.any():
+        raise ValueError(f'{str(uniques[invalid.argmax()])!r} does not match format {format}')
+
+    return parsed[codes]
@@ -0,0 +1,157 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+import intake
+from intake_google_analytics.cache import QueryCache
+from intake_google_analytics.source import GoogleAnalyticsAPI
+from intake_google_analytics.utils import body_key
+from pandas.testing import assert_frame_equal
+
+from .test_source import MockGABatch, MockGAClient, daily_users
+
+
+def make_body(start_date='2020-03-01', end_date='2020-03-19', metric='ga:users'):
+    return {'reportRequests': [{
+        'viewId': 'VIEWID',
+        'dateRanges': [{'startDate': start_date, 'endDate': end_date}],
+        'metrics': [{'expression': metric}]
+    }]}
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        'ga:date': pd.to_datetime(['2020-03-18', '2020-03-19']),
+        'ga:browser': ['Chrome', 'Safari'],
+        'ga:users': [1, 2]
+    })
+
+
+def test_roundtrip(tmp_path, df):
+    cache = QueryCache(str(tmp_path))
+    body = make_body()
+
+    assert cache.get(body) is None
+    cache.put(body, df)
+    assert_frame_equal(cache.get(body), df)
+    assert cache.get(make_body(metric='ga:sessions')) is None
+
+
+def test_key_ignores_dict_order(tmp_path, df):
+    cache = QueryCache(str(tmp_path))
+    body = make_body()
+    cache.put(body, df)
+
+    request = body['reportRequests'][0]
+    reordered = {'reportRequests': [{k: request[k] for k in reversed(list(request))}]}
+    assert_frame_equal(cache.get(reordered), df)
+
+
+def test_is_volatile():
+    assert QueryCache.is_volatile(make_body('5DaysAgo', 'yesterday'))
+    assert QueryCache.is_volatile(make_body('2020-03-01', 'today'))
+    assert QueryCache.is_volatile(make_body('2020-03-01', '2999-01-01'))
+    assert not QueryCache.is_volatile(make_body('2020-03-01', '2020-03-19'))
+
+
+def test_ttl(tmp_path, df):
+    cache = QueryCache(str(tmp_path), ttl=60)
+
+    fixed = make_body()
+    relative = make_body('5DaysAgo', 'yesterday')
+    cache.put(fixed, df)
+    cache.put(relative, df)
+
+    an_hour_ago = time.time() - 3600
+    for entry in os.scandir(str(tmp_path)):
+        os.utime(entry.path, (an_hour_ago, an_hour_ago))
+
+    assert cache.get(fixed) is not None
+    assert cache.get(relative) is None
+
+
+def test_lru_eviction(tmp_path, df):
+    cache = QueryCache(str(tmp_path))
+    bodies = [make_body(metric=f'ga:metric{i}') for i in range(3)]
+    for body in bodies:
+        cache.put(body, df)
+    entry_size = max(e.stat().st_size for e in os.scandir(str(tmp_path)))
+
+    # make the first entry the most recently used one
+    for i, body in enumerate(bodies[1:]):
+        filename = cache._filename(body_key(body))
+        os.utime(filename, (i, os.stat(filename).st_mtime))
+    cache.get(bodies[0])
+
+    cache.max_bytes = entry_size * 2
+    cache.put(make_body(metric='ga:new'), df)
+
+    assert cache.get(bodies[1]) is None
+    assert cache.get(bodies[0]) is not None
+    assert cache.get(make_body(metric='ga:new')) is not None
+
+
+def test_concurrent_eviction(tmp_path, df):
+    from concurrent.futures import ThreadPoolExecutor
+
+    cache = QueryCache(str(tmp_path), max_bytes=5000)
+
+    def store(i):
+        for j in range(20):
+            cache.put(make_body(metric=f'ga:metric{i}-{j}'), df)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(store, range(8)))
+
+    assert sum(e.stat().st_size for e in os.scandir(str(tmp_path))) <= 5000
+
+
+def test_source_uses_cache(monkeypatch, tmp_path):
+    calls = []
+
+    def execute(self):
+        calls.append(self.body)
+        return daily_users(self)
+
+    monkeypatch.setattr(MockGABatch, 'execute', execute)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    def open_source():
+        return intake.open_google_analytics_query(
+            'VIEWID',
+            start_date='2020-03-01', end_date='2020-03-19',
+            metrics=['ga:users'], dimensions=['ga:date'],
+            cache_dir=str(tmp_path)
+        )
+
+    first = open_source().read()
+    assert len(calls) == 1
+
+    second = open_source().read()
+    assert len(calls) == 1
+    assert_frame_equal(first, second)
+
+
+def test_state_roundtrip(tmp_path, df):
+    cache = QueryCache(str(tmp_path))
+    df.attrs = {'sampling': {'sampled': False}}
+    cache.store('key', df, state={'ranges': [['2020-03-01', '2020-03-19']]})
+
+    stored, state = cache.load_state('key')
+    assert_frame_equal(stored, df)
+    assert stored.attrs == {'sampling': {'sampled': False}}
+    assert state == {'ranges': [['2020-03-01', '2020-03-19']]}
+
+    assert cache.load_state('missing') == (None, None)
+
+
+def test_empty_categorical_roundtrip(tmp_path):
+    cache = QueryCache(str(tmp_path))
+    df = pd.DataFrame({'ga:browser': pd.Categorical([]), 'ga:users': pd.Series([], dtype='int64')})
+    cache.store('key', df)
+
+    stored = cache.load('key')
+    assert isinstance(stored['ga:browser'].dtype, pd.CategoricalDtype)
+    assert stored['ga:users'].dtype == 'int64'
@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+from intake_google_analytics import clients
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    calls = {'credentials': 0, 'build': 0}
+
+    def from_service_account_file(path, scopes=None):
+        assert scopes == clients.SCOPES
+        calls['credentials'] += 1
+        return object()
+
+    class Service():
+        def reports(self):
+            return object()
+
+    def build(*args, **kwargs):
+        calls['build'] += 1
+        return Service()
+
+    monkeypatch.setattr(clients.Credentials, 'from_service_account_file', from_service_account_file)
+    monkeypatch.setattr(clients.discovery, 'build', build)
+    clients.clear()
+    yield calls
+    clients.clear()
+
+
+def test_shared_credentials(registry):
+    first = clients.get_credentials('client_secrets.json')
+    assert clients.get_credentials('./client_secrets.json') is first
+    assert clients.get_credentials('other.json') is not first
+    assert registry['credentials'] == 2
+
+
+def test_shared_resources(registry):
+    first = clients.get_reports_resource('client_secrets.json')
+    assert clients.get_reports_resource('client_secrets.json') is first
+    assert registry['build'] == 1
+    assert registry['credentials'] == 1
+
+
+def test_resources_per_thread(registry):
+    main = clients.get_reports_resource('client_secrets.json')
+
+    other = []
+    thread = threading.Thread(
+        target=lambda: other.append(clients.get_reports_resource('client_secrets.json')))
+    thread.start()
+    thread.join()
+
+    assert other[0] is not main
+    assert registry['build'] == 2
+    assert registry['credentials'] == 1
+
+
+def test_clear(registry):
+    first = clients.get_reports_resource('client_secrets.json')
+    clients.clear()
+    assert clients.get_reports_resource('client_secrets.json') is not first
+    assert registry['credentials'] == 2
+
+
+def test_clear_from_other_thread(registry):
+    first = clients.get_reports_resource('client_secrets.json')
+
+    thread = threading.Thread(target=clients.clear)
+    thread.start()
+    thread.join()
+
+    assert clients.get_reports_resource('client_secrets.json') is not first
+    assert registry['build'] == 2
+    assert registry['credentials'] == 2
+
+
+def test_clear_rebuilds_api_clients(registry):
+    from intake_google_analytics.source import GoogleAnalyticsAPI
+
+    api = GoogleAnalyticsAPI('client_secrets.json')
+    first = api.client
+    assert api.client is first
+
+    clients.clear()
+    assert api.client is not first
+    assert registry['build'] == 2
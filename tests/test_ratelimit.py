@@ -0,0 +1,76 @@
+import threading
+import time
+
+import pytest
+from intake_google_analytics import ratelimit
+from intake_google_analytics.ratelimit import RateLimiter, get_limiter
+
+
+@pytest.fixture(autouse=True)
+def clear_limiters():
+    ratelimit.clear()
+    yield
+    ratelimit.clear()
+
+
+def test_requests_per_second():
+    limiter = RateLimiter(requests_per_second=20, burst=1)
+
+    start = time.monotonic()
+    for _ in range(5):
+        with limiter:
+            pass
+    elapsed = time.monotonic() - start
+
+    # the first request uses the initial token, the other four wait 50ms each
+    assert 0.19 <= elapsed < 1
+
+
+def test_burst():
+    limiter = RateLimiter(requests_per_second=1, burst=5)
+
+    start = time.monotonic()
+    for _ in range(5):
+        with limiter:
+            pass
+    assert time.monotonic() - start < 0.5
+
+
+def test_max_in_flight():
+    limiter = RateLimiter(max_in_flight=2)
+    lock = threading.Lock()
+    in_flight = [0]
+    peak = [0]
+
+    def request():
+        with limiter:
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.02)
+            with lock:
+                in_flight[0] -= 1
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert peak[0] == 2
+
+
+def test_unlimited():
+    limiter = RateLimiter()
+    start = time.monotonic()
+    for _ in range(100):
+        with limiter:
+            pass
+    assert time.monotonic() - start < 0.5
+
+
+def test_shared_limiters():
+    limiter = get_limiter(('view', '1'), requests_per_second=10)
+    assert get_limiter(('view', '1'), requests_per_second=5) is limiter
+    assert limiter.requests_per_second == 5
+    assert get_limiter(('view', '2'), requests_per_second=10) is not limiter
@@ -0,0 +1,69 @@
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+from intake_google_analytics import retry
+from intake_google_analytics.retry import RetryPolicy
+
+
+def http_error(status, content=b''):
+    return HttpError(httplib2.Response({'status': status}), content)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(retry.time, 'sleep', slept.append)
+    return slept
+
+
+def failing(errors, result='done'):
+    errors = list(errors)
+
+    def func():
+        if errors:
+            raise errors.pop(0)
+        return result
+    return func
+
+
+def test_is_retryable():
+    policy = RetryPolicy()
+    assert policy.is_retryable(http_error(429))
+    assert policy.is_retryable(http_error(503))
+    assert policy.is_retryable(http_error(403, b'{"error": {"errors": [{"reason": "userRateLimitExceeded"}]}}'))
+    assert policy.is_retryable(ConnectionResetError())
+    assert policy.is_retryable(TimeoutError())
+
+    assert not policy.is_retryable(http_error(400))
+    assert not policy.is_retryable(http_error(403, b'{"error": {"message": "User does not have permission"}}'))
+    assert not policy.is_retryable(ValueError())
+
+    assert not RetryPolicy(statuses=[503]).is_retryable(http_error(429))
+
+
+def test_retries_until_success(sleeps):
+    policy = RetryPolicy(max_attempts=4, backoff=1, max_backoff=3)
+    func = failing([http_error(429), http_error(503), ConnectionResetError()])
+    assert policy.call(func) == 'done'
+
+    assert len(sleeps) == 3
+    for attempt, delay in enumerate(sleeps, 1):
+        assert 0 <= delay <= min(3, 2 ** (attempt - 1))
+
+
+def test_gives_up(sleeps):
+    policy = RetryPolicy(max_attempts=3)
+    with pytest.raises(HttpError):
+        policy.call(failing([http_error(429)] * 3))
+    assert len(sleeps) == 2
+
+
+def test_does_not_retry_other_errors(sleeps):
+    with pytest.raises(HttpError):
+        RetryPolicy().call(failing([http_error(400)]))
+    assert sleeps == []
+
+
+def test_max_attempts():
+    with pytest.raises(ValueError):
+        RetryPolicy(max_attempts=0)
@@ -1,11 +1,14 @@
+import asyncio
+import copy
 import datetime as dt
+import pickle
 
 import pandas as pd
 import pytest
 import intake
 from intake_google_analytics.source import GoogleAnalyticsAPI
 from pandas.api.types import (is_datetime64_any_dtype, is_float_dtype,
-                              is_integer_dtype)
+                              is_integer_dtype, is_string_dtype)
 from pandas.testing import assert_frame_equal
 
 
@@ -108,6 +111,7 @@ def test_query_body(monkeypatch):
          'hideValueRanges': True,
          'includeEmptyRows': True,
          'metrics': [{'expression': 'ga:users'}],
+         'pageSize': 100000,
          'viewId': 'VIEWID'}
     ]}
 
@@ -132,6 +136,7 @@ def test_query_body_with_dimensions(monkeypatch):
          'includeEmptyRows': True,
          'metrics': [{'expression': 'ga:users'}],
          'dimensions': [{'name': 'ga:userType'}],
+         'pageSize': 100000,
          'viewId': 'VIEWID'}
     ]}
 
@@ -150,6 +155,55 @@ def test_dataframe_empty_report():
     assert df.empty
 
 
+def test_query_body_page_size(monkeypatch):
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: None)
+
+    inputs = {
+        'view_id': 'VIEWID',
+        'start_date': '5DaysAgo', 'end_date': 'yesterday',
+        'metrics': ['ga:users']
+    }
+
+    client = GoogleAnalyticsAPI(None)
+    body = client._build_body(page_size=5000, **inputs)
+    assert body['reportRequests'][0]['pageSize'] == 5000
+
+    body = client._build_body(page_size=None, **inputs)
+    assert 'pageSize' not in body['reportRequests'][0]
+
+    with pytest.raises(ValueError):
+        client._build_body(page_size=100001, **inputs)
+
+    with pytest.raises(ValueError):
+        client._build_body(page_size=0, **inputs)
+
+
+def test_dataframe_columns():
+    report = {
+        'columnHeader':
+            {'dimensions': ['ga:userType', 'ga:browser'],
+             'metricHeader': {'metricHeaderEntries': [{'name': 'ga:users', 'type': 'INTEGER'},
+                                                      {'name': 'ga:bounceRate', 'type': 'PERCENT'}]}},
+            'data': {
+                'rowCount': 3,
+                'rows': [{'dimensions': ['New Visitor', 'Chrome'],
+                          'metrics': [{'values': ['3', '12.5']}]},
+                         {'dimensions': ['Returning Visitor', 'Safari'],
+                          'metrics': [{'values': ['4', '0.0']}]},
+                         {'dimensions': ['Returning Visitor', 'Edge']}]
+            }
+    }
+    expected = pd.DataFrame({
+        'ga:userType': ['New Visitor', 'Returning Visitor', 'Returning Visitor'],
+        'ga:browser': ['Chrome', 'Safari', 'Edge'],
+        'ga:users': [3, 4, 0],
+        'ga:bounceRate': [12.5, 0.0, 0.0]
+    })
+    df = GoogleAnalyticsAPI._to_dataframe(report)
+    assert_frame_equal(df, expected)
+    assert report['columnHeader']['dimensions'] == ['ga:userType', 'ga:browser']
+
+
 datetime_dimensions = [
     ('ga:yearMonth', '202003'),
     ('ga:date', '20200319'),
@@ -382,3 +436,1404 @@ def test_load_dataset(monkeypatch):
 
     df = ds.read()
     assert_frame_equal(df, pd.DataFrame([{'ga:users': 1}]), check_dtype=False)
+
+
+def daily_users(self):
+    """One row per day of the requested range with ga:users set to the day of month"""
+    request = self.body['reportRequests'][0]
+    date_range = request['dateRanges'][0]
+    days = pd.date_range(date_range['startDate'], date_range['endDate'], freq='D')
+    return {'reports': [
+        {'columnHeader': {'dimensions': ['ga:date'],
+                          'metricHeader': {'metricHeaderEntries': [{'name': 'ga:users',
+                                                                    'type': 'INTEGER'}]}},
+         'data': {'rowCount': len(days), 'rows': [
+             {'dimensions': [d.strftime('%Y%m%d')], 'metrics': [{'values': [str(d.day)]}]}
+             for d in days
+         ]}}
+    ]}
+
+
+def test_partitioned_source(monkeypatch):
+    monkeypatch.setattr(MockGABatch, 'execute', daily_users)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ds = intake.open_google_analytics_query(
+        'VIEWID',
+        start_date='2020-01-30', end_date='2020-03-03',
+        metrics=['ga:users'], dimensions=['ga:date'],
+        partition_by='month'
+    )
+
+    info = ds.discover()
+    assert info['npartitions'] == 3
+    assert is_datetime64_any_dtype(info['dtype']['ga:date'])
+
+    assert len(ds.read_partition(0)) == 2
+    assert len(ds.read_partition(1)) == 29
+    assert len(ds.read_partition(2)) == 3
+
+    df = ds.read()
+    assert len(df) == 34
+    assert df['ga:date'].is_monotonic_increasing
+
+
+def test_partitioned_to_dask(monkeypatch):
+    monkeypatch.setattr(MockGABatch, 'execute', daily_users)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ds = intake.open_google_analytics_query(
+        'VIEWID',
+        start_date='2020-03-01', end_date='2020-03-19',
+        metrics=['ga:users'], dimensions=['ga:date'],
+        partition_by='week'
+    )
+
+    ddf = ds.to_dask()
+    assert ddf.npartitions == 4
+    assert_frame_equal(ddf.compute().reset_index(drop=True), ds.read())
+
+
+def test_to_dask_without_from_map(monkeypatch):
+    import dask.dataframe as dd
+
+    monkeypatch.setattr(MockGABatch, 'execute', daily_users)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+    monkeypatch.delattr(dd, 'from_map')
+
+    ds = intake.open_google_analytics_query(
+        'VIEWID',
+        start_date='2020-03-01', end_date='2020-03-19',
+        metrics=['ga:users'], dimensions=['ga:date'],
+        partition_by='week'
+    )
+
+    ddf = ds.to_dask()
+    assert ddf.npartitions == 4
+    assert_frame_equal(ddf.compute().reset_index(drop=True), ds.read())
+
+
+def offset_pages(self):
+    """Ten rows served three per page using row-offset page tokens"""
+    request = self.body['reportRequests'][0]
+    offset = int(request.get('pageToken', '0'))
+    rows = [{'metrics': [{'values': [str(v)]}]} for v in range(offset, min(offset + 3, 10))]
+    report = {'columnHeader': {'metricHeader': {'metricHeaderEntries': [{'name': 'ga:users',
+                                                                         'type': 'INTEGER'}]}},
+              'data': {'rowCount': 10, 'rows': rows}}
+    if offset + 3 < 10:
+        report['nextPageToken'] = str(offset + 3)
+    return {'reports': [report]}
+
+
+@pytest.mark.parametrize('max_concurrent_pages', [None, 1, 4])
+def test_concurrent_pages(monkeypatch, max_concurrent_pages):
+    monkeypatch.setattr(MockGABatch, 'execute', offset_pages)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ga_api = GoogleAnalyticsAPI(None, max_concurrent_pages=max_concurrent_pages)
+    df = ga_api.query(
+        'VIEWID',
+        start_date='5DaysAgo', end_date='yesterday',
+        metrics=['ga:user']
+    )
+    assert df['ga:users'].tolist() == list(range(10))
+
+
+class RecordingGAClient(MockGAClient):
+    """Answer every reportRequest with one row holding its metric count"""
+    bodies = []
+
+    def batchGet(self, body):
+        RecordingGAClient.bodies.append(body)
+        return MockGABatch(body)
+
+
+def echo_requests(self):
+    reports = []
+    for request in self.body['reportRequests']:
+        names = [m['expression'] for m in request['metrics']]
+        reports.append({
+            'columnHeader': {'metricHeader': {'metricHeaderEntries': [
+                {'name': n, 'type': 'INTEGER'} for n in names]}},
+            'data': {'rowCount': 1, 'rows': [{'metrics': [{'values': ['1'] * len(names)}]}]}
+        })
+    return {'reports': reports}
+
+
+def test_query_many(monkeypatch):
+    monkeypatch.setattr(MockGABatch, 'execute', echo_requests)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: RecordingGAClient(x))
+    monkeypatch.setattr(RecordingGAClient, 'bodies', [])
+
+    queries = [
+        {'view_id': 'VIEWID', 'start_date': '5DaysAgo', 'end_date': 'yesterday',
+         'metrics': [f'ga:metric{i}']}
+        for i in range(7)
+    ]
+    queries.insert(2, {'view_id': 'OTHER', 'start_date': '5DaysAgo', 'end_date': 'yesterday',
+                       'metrics': ['ga:other']})
+
+    ga_api = GoogleAnalyticsAPI(None)
+    dfs = ga_api.query_many(queries)
+
+    assert [df.columns[0] for df in dfs] == [q['metrics'][0] for q in queries]
+    assert [len(b['reportRequests']) for b in RecordingGAClient.bodies] == [5, 2, 1]
+    assert all(len({r['viewId'] for r in b['reportRequests']}) == 1
+               for b in RecordingGAClient.bodies)
+
+    with pytest.raises(ValueError, match='unsampled'):
+        ga_api.query_many([dict(queries[0], unsampled=True)])
+
+
+def test_iter_query(monkeypatch):
+    monkeypatch.setattr(MockGABatch, 'execute', offset_pages)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ga_api = GoogleAnalyticsAPI(None)
+    chunks = list(ga_api.iter_query(
+        'VIEWID',
+        start_date='5DaysAgo', end_date='yesterday',
+        metrics=['ga:user']
+    ))
+    assert [len(df) for df in chunks] == [3, 3, 3, 1]
+    assert all(is_integer_dtype(df['ga:users']) for df in chunks)
+    assert pd.concat(chunks)['ga:users'].tolist() == list(range(10))
+
+
+def test_iter_query_empty_result(monkeypatch):
+    monkeypatch.setattr(MockGABatch, 'execute', lambda body: {
+            'reports': [
+                {'columnHeader': {'metricHeader': {'metricHeaderEntries': [{'name': 'ga:users',
+                                                            'type': 'INTEGER'}]}},
+                 'data': {}}
+                ]
+            }
+    )
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ga_api = GoogleAnalyticsAPI(None)
+    chunks = list(ga_api.iter_query(
+        'VIEWID',
+        start_date='5DaysAgo', end_date='yesterday',
+        metrics=['ga:user']
+    ))
+    assert len(chunks) == 1
+    assert chunks[0].empty
+    assert list(chunks[0].columns) == ['ga:users']
+
+
+def test_read_chunked(monkeypatch):
+    monkeypatch.setattr(MockGABatch, 'execute', daily_users)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ds = intake.open_google_analytics_query(
+        'VIEWID',
+        start_date='2020-03-01', end_date='2020-03-19',
+        metrics=['ga:users'], dimensions=['ga:date'],
+        partition_by='week'
+    )
+
+    chunks = list(ds.read_chunked())
+    assert [len(df) for df in chunks] == [1, 7, 7, 4]
+    assert_frame_equal(pd.concat(chunks, ignore_index=True), ds.read())
+
+
+def test_incremental(monkeypatch, tmp_path):
+    date_ranges = []
+
+    def execute(self):
+        date_ranges.append(self.body['reportRequests'][0]['dateRanges'][0])
+        return daily_users(self)
+
+    monkeypatch.setattr(MockGABatch, 'execute', execute)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    def read(start_date, end_date):
+        del date_ranges[:]
+        return intake.open_google_analytics_query(
+            'VIEWID',
+            start_date=start_date, end_date=end_date,
+            metrics=['ga:users'], dimensions=['ga:date'],
+            cache_dir=str(tmp_path), incremental=True
+        ).read()
+
+    df = read('2020-03-01', '2020-03-10')
+    assert date_ranges == [{'startDate': '2020-03-01', 'endDate': '2020-03-10'}]
+    assert len(df) == 10
+
+    df = read('2020-03-01', '2020-03-15')
+    assert date_ranges == [{'startDate': '2020-03-11', 'endDate': '2020-03-15'}]
+    assert_frame_equal(df, daily_frame('2020-03-01', '2020-03-15'), check_dtype=False)
+
+    df = read('2020-02-25', '2020-03-12')
+    assert date_ranges == [{'startDate': '2020-02-25', 'endDate': '2020-02-29'}]
+    assert_frame_equal(df, daily_frame('2020-02-25', '2020-03-12'), check_dtype=False)
+
+    df = read('2020-03-03', '2020-03-05')
+    assert date_ranges == []
+    assert_frame_equal(df, daily_frame('2020-03-03', '2020-03-05'), check_dtype=False)
+
+
+def test_incremental_keeps_disjoint_ranges(monkeypatch, tmp_path):
+    date_ranges = []
+
+    def execute(self):
+        date_ranges.append(self.body['reportRequests'][0]['dateRanges'][0])
+        return daily_users(self)
+
+    monkeypatch.setattr(MockGABatch, 'execute', execute)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    def read(start_date, end_date):
+        del date_ranges[:]
+        return intake.open_google_analytics_query(
+            'VIEWID',
+            start_date=start_date, end_date=end_date,
+            metrics=['ga:users'], dimensions=['ga:date'],
+            cache_dir=str(tmp_path), incremental=True
+        ).read()
+
+    read('2020-03-01', '2020-03-31')
+    read('2020-05-01', '2020-05-31')
+
+    df = read('2020-03-01', '2020-03-31')
+    assert date_ranges == []
+    assert_frame_equal(df, daily_frame('2020-03-01', '2020-03-31'), check_dtype=False)
+
+    # only the gap between the stored ranges is requested
+    df = read('2020-03-15', '2020-05-15')
+    assert date_ranges == [{'startDate': '2020-04-01', 'endDate': '2020-04-30'}]
+    assert_frame_equal(df, daily_frame('2020-03-15', '2020-05-15'), check_dtype=False)
+
+
+def test_incremental_refreshes_recent_days(monkeypatch, tmp_path):
+    date_ranges = []
+
+    def execute(self):
+        date_ranges.append(self.body['reportRequests'][0]['dateRanges'][0])
+        return daily_users(self)
+
+    monkeypatch.setattr(MockGABatch, 'execute', execute)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    def read():
+        return intake.open_google_analytics_query(
+            'VIEWID',
+            start_date='10DaysAgo', end_date='yesterday',
+            metrics=['ga:users'], dimensions=['ga:date'],
+            cache_dir=str(tmp_path), incremental=True, settle_days=3
+        ).read()
+
+    first = read()
+    second = read()
+    today = dt.date.today()
+    assert date_ranges[1] == {'startDate': str(today - dt.timedelta(days=3)),
+                              'endDate': str(today - dt.timedelta(days=1))}
+    assert_frame_equal(first, second)
+
+
+def test_incremental_arguments(monkeypatch, tmp_path):
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    with pytest.raises(ValueError):
+        intake.open_google_analytics_query(
+            'VIEWID', start_date='10DaysAgo', end_date='yesterday',
+            metrics=['ga:users'], dimensions=['ga:date'], incremental=True
+        )
+
+    with pytest.raises(ValueError):
+        intake.open_google_analytics_query(
+            'VIEWID', start_date='10DaysAgo', end_date='yesterday',
+            metrics=['ga:users'], dimensions=['ga:date'], incremental=True,
+            cache_dir=str(tmp_path), partition_by='day'
+        )
+
+
+def daily_frame(start_date, end_date):
+    days = pd.date_range(start_date, end_date, freq='D')
+    return pd.DataFrame({'ga:date': days, 'ga:users': days.day})
+
+
+def test_lazy_client(monkeypatch):
+    created = []
+    monkeypatch.setattr(MockGABatch, 'execute', daily_users)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client',
+                        lambda x: created.append(x) or MockGAClient(x))
+
+    ds = intake.open_google_analytics_query(
+        'VIEWID',
+        start_date='2020-03-01', end_date='2020-03-19',
+        metrics=['ga:users'], dimensions=['ga:date'],
+        credentials_path='does-not-exist.json'
+    )
+    assert created == []
+
+    ds.read()
+    ds.read()
+    assert len(created) == 1
+
+
+def test_api_pickle(monkeypatch):
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ga_api = GoogleAnalyticsAPI('client_secrets.json', max_concurrent_pages=2)
+    assert isinstance(ga_api.client, MockGAClient)
+
+    restored = pickle.loads(pickle.dumps(ga_api))
+    assert restored._credentials_path == 'client_secrets.json'
+    assert restored._max_concurrent_pages == 2
+    assert isinstance(restored.client, MockGAClient)
+
+
+def test_discover_probes_one_row(monkeypatch):
+    bodies = []
+
+    def execute(self):
+        bodies.append(self.body)
+        request = self.body['reportRequests'][0]
+        report = daily_users(self)
+        rows = report['reports'][0]['data']['rows']
+        del rows[request['pageSize']:]
+        return report
+
+    monkeypatch.setattr(MockGABatch, 'execute', execute)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ds = intake.open_google_analytics_query(
+        'VIEWID',
+        start_date='2020-03-01', end_date='2020-03-19',
+        metrics=['ga:users'], dimensions=['ga:date'],
+        partition_by='week'
+    )
+
+    info = ds.discover()
+    assert len(bodies) == 1
+    assert bodies[0]['reportRequests'][0]['pageSize'] == 1
+    assert bodies[0]['reportRequests'][0]['dateRanges'] == [
+        {'startDate': '2020-03-01', 'endDate': '2020-03-19'}]
+
+    assert info['shape'] == (19, 2)
+    assert info['npartitions'] == 4
+    assert is_datetime64_any_dtype(info['dtype']['ga:date'])
+    assert is_integer_dtype(info['dtype']['ga:users'])
+
+
+def test_retry_keeps_fetched_pages(monkeypatch):
+    import httplib2
+    from googleapiclient.errors import HttpError
+    from intake_google_analytics import retry
+
+    requested = []
+    failures = {'6': 2}
+
+    def execute(self):
+        token = self.body['reportRequests'][0].get('pageToken', '0')
+        requested.append(token)
+        if failures.get(token):
+            failures[token] -= 1
+            raise HttpError(httplib2.Response({'status': 429}), b'RESOURCE_EXHAUSTED')
+        return offset_pages(self)
+
+    monkeypatch.setattr(retry.time, 'sleep', lambda s: None)
+    monkeypatch.setattr(MockGABatch, 'execute', execute)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ga_api = GoogleAnalyticsAPI(None)
+    df = ga_api.query(
+        'VIEWID',
+        start_date='5DaysAgo', end_date='yesterday',
+        metrics=['ga:user']
+    )
+    assert df['ga:users'].tolist() == list(range(10))
+    assert requested == ['0', '3', '6', '6', '6', '9']
+
+
+def test_source_retry_option():
+    def source(**kwargs):
+        return intake.open_google_analytics_query(
+            'VIEWID', start_date='5DaysAgo', end_date='yesterday', metrics=['ga:users'],
+            **kwargs)
+
+    assert source()._client._retry.max_attempts == 5
+    assert source(retry={'max_attempts': 8})._client._retry.max_attempts == 8
+    assert source(retry=None)._client._retry is None
+
+
+def test_rate_limit_scopes(monkeypatch):
+    from intake_google_analytics import ratelimit, source
+
+    class FakeCredentials():
+        project_id = 'my-project'
+
+    scopes = []
+
+    def get_limiter(scope, **kwargs):
+        scopes.append((scope, kwargs))
+        return ratelimit.RateLimiter(**kwargs)
+
+    monkeypatch.setattr(source, 'get_limiter', get_limiter)
+    monkeypatch.setattr(source, 'get_credentials', lambda path: FakeCredentials())
+    monkeypatch.setattr(MockGABatch, 'execute', offset_pages)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ga_api = GoogleAnalyticsAPI('client_secrets.json', rate_limit={
+        'project': {'requests_per_second': 10},
+        'view': {'max_in_flight': 2}
+    })
+    ga_api.query('VIEWID', start_date='5DaysAgo', end_date='yesterday', metrics=['ga:user'])
+
+    assert len(scopes) == 8
+    assert scopes[:2] == [(('project', 'my-project'), {'requests_per_second': 10}),
+                          (('view', 'VIEWID'), {'max_in_flight': 2})]
+
+    with pytest.raises(ValueError):
+        GoogleAnalyticsAPI(None, rate_limit={'account': {'requests_per_second': 1}})
+
+
+def async_mock(execute):
+    """Serve _aexecute_once from a MockGABatch-style execute function"""
+    async def _aexecute_once(self, body, session):
+        await asyncio.sleep(0)
+        return execute(MockGABatch(copy.deepcopy(body)))
+    return _aexecute_once
+
+
+@pytest.mark.parametrize('max_concurrent_pages', [None, 3])
+def test_aquery(monkeypatch, max_concurrent_pages):
+    monkeypatch.setattr(GoogleAnalyticsAPI, '_aexecute_once', async_mock(offset_pages))
+
+    ga_api = GoogleAnalyticsAPI(None, max_concurrent_pages=max_concurrent_pages)
+
+    async def run():
+        return await asyncio.gather(*[
+            ga_api.aquery('VIEWID', start_date='5DaysAgo', end_date='yesterday',
+                          metrics=['ga:user'], session=object())
+            for _ in range(3)
+        ])
+
+    for df in asyncio.run(run()):
+        assert df['ga:users'].tolist() == list(range(10))
+
+
+def test_aiter_query(monkeypatch):
+    monkeypatch.setattr(GoogleAnalyticsAPI, '_aexecute_once', async_mock(offset_pages))
+
+    ga_api = GoogleAnalyticsAPI(None)
+
+    async def run():
+        return [df async for df in ga_api.aiter_query(
+            'VIEWID', start_date='5DaysAgo', end_date='yesterday',
+            metrics=['ga:user'], session=object())]
+
+    chunks = asyncio.run(run())
+    assert [len(df) for df in chunks] == [3, 3, 3, 1]
+
+
+class FakeResponse():
+    def __init__(self, status, content):
+        self.status = status
+        self.content = content
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def read(self):
+        return self.content
+
+
+class TimeoutResponse(FakeResponse):
+    def __init__(self):
+        super().__init__(None, None)
+
+    async def __aenter__(self):
+        raise asyncio.TimeoutError()
+
+
+class FakeSession():
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def post(self, url, json, headers):
+        self.requests.append((url, json, headers))
+        return self.responses.pop(0)
+
+
+def test_aexecute_http(monkeypatch):
+    import json
+    from googleapiclient.errors import HttpError
+    from intake_google_analytics import retry, source
+
+    class FakeCredentials():
+        valid = True
+
+        def apply(self, headers):
+            headers['authorization'] = 'Bearer TOKEN'
+
+    async def no_sleep(seconds):
+        pass
+
+    monkeypatch.setattr(source, 'get_credentials', lambda path: FakeCredentials())
+    monkeypatch.setattr(retry.asyncio, 'sleep', no_sleep)
+
+    result = {'reports': [
+        {'columnHeader': {'metricHeader': {'metricHeaderEntries': [{'name': 'ga:users',
+                                                                    'type': 'INTEGER'}]}},
+         'data': {'rowCount': 1, 'rows': [{'metrics': [{'values': ['1']}]}]}}
+    ]}
+    session = FakeSession([
+        FakeResponse(503, b'unavailable'),
+        FakeResponse(200, json.dumps(result).encode()),
+        FakeResponse(400, b'bad request'),
+    ])
+
+    ga_api = GoogleAnalyticsAPI(None)
+    df = asyncio.run(ga_api.aquery('VIEWID', start_date='5DaysAgo', end_date='yesterday',
+                                   metrics=['ga:users'], session=session))
+    assert_frame_equal(df, pd.DataFrame([{'ga:users': 1}]))
+
+    url, body, headers = session.requests[0]
+    assert url == 'https://analyticsreporting.googleapis.com/v4/reports:batchGet'
+    assert body['reportRequests'][0]['viewId'] == 'VIEWID'
+    assert headers == {'authorization': 'Bearer TOKEN'}
+
+    with pytest.raises(HttpError):
+        asyncio.run(ga_api.aquery('VIEWID', start_date='5DaysAgo', end_date='yesterday',
+                                  metrics=['ga:users'], session=session))
+
+    # aiohttp timeouts are retried like connection errors
+    session = FakeSession([TimeoutResponse(), FakeResponse(200, json.dumps(result).encode())])
+    df = asyncio.run(ga_api.aquery('VIEWID', start_date='5DaysAgo', end_date='yesterday',
+                                   metrics=['ga:users'], session=session))
+    assert_frame_equal(df, pd.DataFrame([{'ga:users': 1}]))
+    assert len(session.requests) == 2
+
+
+@pytest.mark.parametrize('max_concurrent_pages', [None, 2])
+def test_checkpoint_resume(monkeypatch, tmp_path, max_concurrent_pages):
+    requested = []
+    fail = {'6'}
+
+    def execute(self):
+        token = self.body['reportRequests'][0].get('pageToken', '0')
+        requested.append(token)
+        if token in fail:
+            fail.remove(token)
+            raise ConnectionAbortedError('connection lost')
+        return offset_pages(self)
+
+    monkeypatch.setattr(MockGABatch, 'execute', execute)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ga_api = GoogleAnalyticsAPI(None, max_concurrent_pages=max_concurrent_pages,
+                                retry=None, checkpoint_dir=str(tmp_path))
+    query = dict(view_id='VIEWID', start_date='5DaysAgo', end_date='yesterday',
+                 metrics=['ga:user'])
+
+    with pytest.raises(ConnectionAbortedError):
+        ga_api.query(**query)
+    assert {'0', '3', '6'} <= set(requested)
+
+    del requested[:]
+    df = ga_api.query(**query)
+    assert df['ga:users'].tolist() == list(range(10))
+    # page 0 is part of the initial request, page 3 comes from the checkpoint
+    assert requested[0] == '0'
+    assert '6' in requested
+    assert '3' not in requested
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_checkpoint_iter_query(monkeypatch, tmp_path):
+    requested = []
+    fail = {'9'}
+
+    def execute(self):
+        token = self.body['reportRequests'][0].get('pageToken', '0')
+        requested.append(token)
+        if token in fail:
+            fail.remove(token)
+            raise ConnectionAbortedError('connection lost')
+        return offset_pages(self)
+
+    monkeypatch.setattr(MockGABatch, 'execute', execute)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ga_api = GoogleAnalyticsAPI(None, retry=None, checkpoint_dir=str(tmp_path))
+    query = dict(view_id='VIEWID', start_date='5DaysAgo', end_date='yesterday',
+                 metrics=['ga:user'])
+
+    with pytest.raises(ConnectionAbortedError):
+        list(ga_api.iter_query(**query))
+
+    del requested[:]
+    chunks = list(ga_api.iter_query(**query))
+    assert [len(df) for df in chunks] == [3, 3, 3, 1]
+    assert requested == ['9']
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_checkpoint_loads_pages_lazily(monkeypatch, tmp_path):
+    from intake_google_analytics.checkpoint import Checkpoint
+
+    fail = {'9'}
+
+    def execute(self):
+        token = self.body['reportRequests'][0].get('pageToken', '0')
+        if token in fail:
+            fail.remove(token)
+            raise ConnectionAbortedError('connection lost')
+        return offset_pages(self)
+
+    loaded = []
+    load = Checkpoint.load
+
+    def record_load(filename):
+        loaded.append(filename)
+        return load(filename)
+
+    monkeypatch.setattr(MockGABatch, 'execute', execute)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+    monkeypatch.setattr(Checkpoint, 'load', staticmethod(record_load))
+
+    ga_api = GoogleAnalyticsAPI(None, retry=None, checkpoint_dir=str(tmp_path))
+    query = dict(view_id='VIEWID', start_date='5DaysAgo', end_date='yesterday',
+                 metrics=['ga:user'])
+    with pytest.raises(ConnectionAbortedError):
+        list(ga_api.iter_query(**query))
+
+    # pages 0, 3 and 6 are stored, only those yielded so far are read
+    chunks = ga_api.iter_query(**query)
+    next(chunks)
+    next(chunks)
+    assert len(loaded) == 2
+    assert [len(df) for df in chunks] == [3, 1]
+    assert len(loaded) == 3
+
+
+def sampled_above(days, execute):
+    """Mark reports for ranges longer than ``days`` as sampled"""
+    def sampled_execute(self):
+        result = execute(self)
+        date_range = self.body['reportRequests'][0]['dateRanges'][0]
+        length = (pd.Timestamp(date_range['endDate']) - pd.Timestamp(date_range['startDate'])).days + 1
+        if length > days:
+            result['reports'][0]['data']['samplesReadCounts'] = ['1000']
+            result['reports'][0]['data']['samplingSpaceSizes'] = ['5000']
+        return result
+    return sampled_execute
+
+
+def sessions_by_browser(self):
+    request = self.body['reportRequests'][0]
+    date_range = request['dateRanges'][0]
+    days = len(pd.date_range(date_range['startDate'], date_range['endDate'], freq='D'))
+    names = [m['expression'] for m in request['metrics']]
+    return {'reports': [
+        {'columnHeader': {'dimensions': ['ga:browser'],
+                          'metricHeader': {'metricHeaderEntries': [
+                              {'name': n, 'type': 'INTEGER'} for n in names]}},
+         'data': {'rowCount': 2, 'rows': [
+             {'dimensions': ['Chrome'], 'metrics': [{'values': [str(days)] * len(names)}]},
+             {'dimensions': ['Safari'], 'metrics': [{'values': [str(2 * days)] * len(names)}]},
+         ]}}
+    ]}
+
+
+def test_unsampled_concatenates_daily_reports(monkeypatch):
+    probes = []
+    date_ranges = []
+
+    def execute(self):
+        request = self.body['reportRequests'][0]
+        if request['pageSize'] == 1:
+            probes.append(request['dateRanges'][0])
+        else:
+            date_ranges.append(request['dateRanges'][0])
+        return sampled_above(5, daily_users)(self)
+
+    monkeypatch.setattr(MockGABatch, 'execute', execute)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ga_api = GoogleAnalyticsAPI(None)
+    df = ga_api.query('VIEWID', start_date='2020-03-01', end_date='2020-03-19',
+                      metrics=['ga:users'], dimensions=['ga:date'], unsampled=True)
+
+    assert_frame_equal(df, daily_frame('2020-03-01', '2020-03-19'), check_dtype=False)
+    # 19 days -> 10 + 9 -> 5 + 5 + 5 + 4, only the unsampled ranges are downloaded
+    assert len(probes) == 7
+    assert sorted(date_ranges, key=lambda d: d['startDate']) == [
+        {'startDate': '2020-03-01', 'endDate': '2020-03-05'},
+        {'startDate': '2020-03-06', 'endDate': '2020-03-10'},
+        {'startDate': '2020-03-11', 'endDate': '2020-03-15'},
+        {'startDate': '2020-03-16', 'endDate': '2020-03-19'},
+    ]
+
+
+def test_unsampled_sums_additive_metrics(monkeypatch):
+    monkeypatch.setattr(MockGABatch, 'execute', sampled_above(5, sessions_by_browser))
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ga_api = GoogleAnalyticsAPI(None)
+    df = ga_api.query('VIEWID', start_date='2020-03-01', end_date='2020-03-19',
+                      metrics=['ga:sessions'], dimensions=['ga:browser'], unsampled=True)
+    assert_frame_equal(df, pd.DataFrame({'ga:browser': ['Chrome', 'Safari'],
+                                         'ga:sessions': [19, 38]}), check_dtype=False)
+
+    with pytest.raises(ValueError):
+        ga_api.query('VIEWID', start_date='2020-03-01', end_date='2020-03-19',
+                     metrics=['ga:users'], dimensions=['ga:browser'], unsampled=True)
+
+
+def test_unsampled_single_day_warns(monkeypatch):
+    monkeypatch.setattr(MockGABatch, 'execute', sampled_above(0, daily_users))
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ga_api = GoogleAnalyticsAPI(None)
+    with pytest.warns(UserWarning):
+        df = ga_api.query('VIEWID', start_date='2020-03-01', end_date='2020-03-02',
+                          metrics=['ga:users'], dimensions=['ga:date'], unsampled=True)
+    assert len(df) == 2
+
+
+def test_query_body_sampling_level(monkeypatch):
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: None)
+
+    inputs = {
+        'view_id': 'VIEWID',
+        'start_date': '5DaysAgo', 'end_date': 'yesterday',
+        'metrics': ['ga:users']
+    }
+
+    client = GoogleAnalyticsAPI(None)
+    assert 'samplingLevel' not in client._build_body(**inputs)['reportRequests'][0]
+
+    body = client._build_body(sampling_level='SMALL', **inputs)
+    assert body['reportRequests'][0]['samplingLevel'] == 'SMALL'
+
+    with pytest.raises(ValueError):
+        client._build_body(sampling_level='TINY', **inputs)
+
+
+def test_sampling_metadata(monkeypatch):
+    bodies = []
+
+    def execute(self):
+        bodies.append(self.body)
+        return sampled_above(5, daily_users)(self)
+
+    monkeypatch.setattr(MockGABatch, 'execute', execute)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ds = intake.open_google_analytics_query(
+        'VIEWID',
+        start_date='2020-03-01', end_date='2020-03-19',
+        metrics=['ga:users'], dimensions=['ga:date'],
+        partition_by='week', sampling_level='SMALL'
+    )
+
+    # the probe covers the full range, which is sampled
+    info = ds.discover()
+    assert info['metadata']['sampling'] == {
+        'sampled': True, 'samples_read': 1000, 'sampling_space': 5000, 'is_data_golden': False}
+
+    # only the three full weeks are sampled
+    ds.read()
+    assert ds.metadata['sampling'] == {
+        'sampled': True, 'samples_read': 2000, 'sampling_space': 10000, 'is_data_golden': False}
+    assert all(b['reportRequests'][0]['samplingLevel'] == 'SMALL' for b in bodies)
+
+    # discovering after a read keeps the stats of the fetched data
+    ds = intake.open_google_analytics_query(
+        'VIEWID',
+        start_date='2020-03-01', end_date='2020-03-19',
+        metrics=['ga:users'], dimensions=['ga:date'],
+        partition_by='week', sampling_level='SMALL'
+    )
+    ds.read()
+    ds.discover()
+    ds.to_dask()
+    assert ds.metadata['sampling']['samples_read'] == 2000
+
+
+def test_sampling_metadata_parallel_reads(monkeypatch):
+    monkeypatch.setattr(MockGABatch, 'execute', sampled_above(0, daily_users))
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ds = intake.open_google_analytics_query(
+        'VIEWID',
+        start_date='2020-03-01', end_date='2020-03-19',
+        metrics=['ga:users'], dimensions=['ga:date']
+    )
+
+    # every request of a read is sampled, repeated reads do not add up
+    for parallel, samples_read in [(None, 1000), (4, 4000), (2, 2000), (None, 1000)]:
+        ds.read(parallel=parallel)
+        assert ds.metadata['sampling']['samples_read'] == samples_read
+
+
+def test_to_arrow():
+    import pyarrow as pa
+
+    report = {
+        'columnHeader':
+            {'dimensions': ['ga:date', 'ga:browser'],
+             'metricHeader': {'metricHeaderEntries': [{'name': 'ga:users', 'type': 'INTEGER'},
+                                                      {'name': 'ga:bounceRate', 'type': 'PERCENT'}]}},
+            'data': {
+                'rowCount': 3,
+                'rows': [{'dimensions': ['20200319', 'Chrome'], 'metrics': [{'values': ['3', '12.5']}]},
+                         {'dimensions': ['20200319', 'Safari'], 'metrics': [{'values': ['4', '0.0']}]},
+                         {'dimensions': ['20200320', 'Chrome']}]
+            }
+    }
+    table = GoogleAnalyticsAPI._to_arrow(report)
+
+    assert pa.types.is_timestamp(table.schema.field('ga:date').type)
+    assert pa.types.is_dictionary(table.schema.field('ga:browser').type)
+    assert table.schema.field('ga:users').type == pa.int64()
+    assert table.schema.field('ga:bounceRate').type == pa.float64()
+
+    df = table.to_pandas()
+    expected = GoogleAnalyticsAPI._to_dataframe(report)
+    assert_frame_equal(df, expected, check_dtype=False, check_categorical=False)
+    assert df['ga:browser'].dtype == 'category'
+
+
+def test_read_arrow(monkeypatch):
+    import pyarrow as pa
+
+    monkeypatch.setattr(MockGABatch, 'execute', daily_users)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ds = intake.open_google_analytics_query(
+        'VIEWID',
+        start_date='2020-03-01', end_date='2020-03-19',
+        metrics=['ga:users'], dimensions=['ga:date'],
+        partition_by='week'
+    )
+
+    table = ds.read_arrow()
+    assert isinstance(table, pa.Table)
+    assert table.num_rows == 19
+    assert_frame_equal(table.to_pandas(), ds.read(), check_dtype=False)
+
+
+def test_query_arrow_pages(monkeypatch):
+    monkeypatch.setattr(MockGABatch, 'execute', offset_pages)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ga_api = GoogleAnalyticsAPI(None)
+    table = ga_api.query_arrow('VIEWID', start_date='5DaysAgo', end_date='yesterday',
+                               metrics=['ga:user'])
+    assert table.column('ga:users').to_pylist() == list(range(10))
+
+
+def browser_report(browsers):
+    return {
+        'columnHeader':
+            {'dimensions': ['ga:date', 'ga:browser'],
+             'metricHeader': {'metricHeaderEntries': [{'name': 'ga:users', 'type': 'INTEGER'}]}},
+            'data': {
+                'rowCount': len(browsers),
+                'rows': [{'dimensions': ['20200319', b], 'metrics': [{'values': ['1']}]}
+                         for b in browsers]
+            }
+    }
+
+
+@pytest.mark.parametrize('categorical, expected', [
+    (False, False),
+    (True, True),
+    ('auto', True),
+])
+def test_categorical_dimensions(categorical, expected):
+    report = browser_report(['Chrome', 'Safari', 'Chrome', 'Chrome'])
+    df = GoogleAnalyticsAPI._to_dataframe(report, categorical=categorical)
+
+    assert isinstance(df['ga:browser'].dtype, pd.CategoricalDtype) == expected
+    assert is_datetime64_any_dtype(df['ga:date'])
+    assert df['ga:browser'].tolist() == ['Chrome', 'Safari', 'Chrome', 'Chrome']
+
+
+def test_categorical_by_name():
+    report = browser_report(['Chrome', 'Safari', 'Firefox', 'Edge'])
+    report['columnHeader']['dimensions'][1] = 'ga:pagePath'
+    df = GoogleAnalyticsAPI._to_dataframe(report, categorical='auto')
+    assert not isinstance(df['ga:pagePath'].dtype, pd.CategoricalDtype)
+
+    df = GoogleAnalyticsAPI._to_dataframe(report, categorical=['ga:pagePath'])
+    assert isinstance(df['ga:pagePath'].dtype, pd.CategoricalDtype)
+
+
+def test_categorical_auto_is_consistent(monkeypatch):
+    def execute(self):
+        report = daily_users(self)['reports'][0]
+        browsers = ['Chrome', 'Safari', 'Firefox']
+        report['columnHeader']['dimensions'].append('ga:browser')
+        for i, row in enumerate(report['data']['rows']):
+            row['dimensions'].append(browsers[i % 3])
+        return {'reports': [report]}
+
+    monkeypatch.setattr(MockGABatch, 'execute', execute)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ds = intake.open_google_analytics_query(
+        'VIEWID',
+        start_date='2020-03-01', end_date='2020-03-19',
+        metrics=['ga:users'], dimensions=['ga:date', 'ga:browser'],
+        partition_by='week', categorical='auto'
+    )
+    ds.discover()
+    assert ds.dtype['ga:browser'] == 'category'
+    assert all(isinstance(ds.read_partition(i)['ga:browser'].dtype, pd.CategoricalDtype)
+               for i in range(ds.npartitions))
+
+    df = ds.read()
+    assert isinstance(df['ga:browser'].dtype, pd.CategoricalDtype)
+    assert sorted(df['ga:browser'].cat.categories) == ['Chrome', 'Firefox', 'Safari']
+
+    ddf = ds.to_dask()
+    assert not ddf['ga:browser'].cat.known
+    assert sorted(ddf['ga:browser'].compute().unique()) == ['Chrome', 'Firefox', 'Safari']
+
+
+def test_categorical_partitions_concatenate(monkeypatch):
+    monkeypatch.setattr(MockGABatch, 'execute', sessions_by_browser)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ds = intake.open_google_analytics_query(
+        'VIEWID',
+        start_date='2020-03-01', end_date='2020-03-19',
+        metrics=['ga:sessions'], dimensions=['ga:browser'],
+        partition_by='week', categorical=True
+    )
+    ds.discover()
+    assert ds.dtype['ga:browser'] == 'category'
+
+    df = ds.read()
+    assert isinstance(df['ga:browser'].dtype, pd.CategoricalDtype)
+    assert len(df) == 2 * ds.npartitions
+
+
+def test_categorical_invalid():
+    with pytest.raises(ValueError):
+        GoogleAnalyticsAPI(None, categorical='always')
+
+
+def test_date_dimensions_by_name():
+    report = {
+        'columnHeader':
+            {'dimensions': ['ga:yearMonth', 'ga:dateHour', 'ga:dimension1'],
+             'metricHeader': {'metricHeaderEntries': [{'name': 'ga:users', 'type': 'INTEGER'}]}},
+            'data': {'rowCount': 0}
+    }
+    df = GoogleAnalyticsAPI._to_dataframe(report)
+    assert is_datetime64_any_dtype(df['ga:yearMonth'])
+    assert is_datetime64_any_dtype(df['ga:dateHour'])
+    assert not is_datetime64_any_dtype(df['ga:dimension1'])
+
+    report['data'] = {'rowCount': 1, 'rows': [
+        {'dimensions': ['202003', '2020031913', '20200319'], 'metrics': [{'values': ['1']}]}
+    ]}
+    df = GoogleAnalyticsAPI._to_dataframe(report)
+    assert df.loc[0, 'ga:yearMonth'] == pd.Timestamp('2020-03-01')
+    assert df.loc[0, 'ga:dateHour'] == pd.Timestamp('2020-03-19 13:00')
+    # other dimensions are still detected from their values
+    assert df.loc[0, 'ga:dimension1'] == pd.Timestamp('2020-03-19')
+
+
+def metrics_by_browser(self):
+    """Chrome has the metric number as value, Safari twice that; Edge only reports ga:metric0"""
+    reports = []
+    for request in self.body['reportRequests']:
+        names = [m.get('alias', m['expression']) for m in request['metrics']]
+        values = [int(m['expression'][len('ga:metric'):]) for m in request['metrics']]
+        rows = [{'dimensions': ['Chrome'], 'metrics': [{'values': [str(v) for v in values]}]},
+                {'dimensions': ['Safari'], 'metrics': [{'values': [str(2 * v) for v in values]}]}]
+        if 0 in values:
+            rows.insert(0, {'dimensions': ['Edge'], 'metrics': [{'values': ['5'] * len(names)}]})
+        reports.append({
+            'columnHeader': {'dimensions': ['ga:browser'], 'metricHeader': {'metricHeaderEntries': [
+                {'name': n, 'type': 'INTEGER'} for n in names]}},
+            'data': {'rowCount': len(rows), 'rows': rows}
+        })
+    return {'reports': reports}
+
+
+def test_query_splits_metrics(monkeypatch):
+    monkeypatch.setattr(MockGABatch, 'execute', metrics_by_browser)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: RecordingGAClient(x))
+    monkeypatch.setattr(RecordingGAClient, 'bodies', [])
+
+    metrics = [f'ga:metric{i}' for i in range(25)]
+    ga_api = GoogleAnalyticsAPI(None)
+    df = ga_api.query('VIEWID', start_date='5DaysAgo', end_date='yesterday',
+                      metrics=metrics, dimensions=['ga:browser'])
+
+    # three chunks of at most 10 metrics, packed into one batchGet
+    assert len(RecordingGAClient.bodies) == 1
+    requests = RecordingGAClient.bodies[0]['reportRequests']
+    assert [len(r['metrics']) for r in requests] == [10, 10, 5]
+    assert all(r['dimensions'] == [{'name': 'ga:browser'}] for r in requests)
+
+    assert df.columns.tolist() == ['ga:browser'] + metrics
+    assert df['ga:browser'].tolist() == ['Edge', 'Chrome', 'Safari']
+    assert df.loc[1, metrics].tolist() == list(range(25))
+    assert df.loc[2, metrics].tolist() == [2 * i for i in range(25)]
+    # Edge is only in the first chunk, the other metrics are 0
+    assert df.loc[0, metrics].tolist() == [5] * 10 + [0] * 15
+    assert all(is_integer_dtype(df[m]) for m in metrics)
+
+
+def test_query_splits_metrics_without_dimensions(monkeypatch):
+    monkeypatch.setattr(MockGABatch, 'execute', echo_requests)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: RecordingGAClient(x))
+    monkeypatch.setattr(RecordingGAClient, 'bodies', [])
+
+    metrics = [f'ga:metric{i}' for i in range(60)]
+    ga_api = GoogleAnalyticsAPI(None)
+    df = ga_api.query('VIEWID', start_date='5DaysAgo', end_date='yesterday', metrics=metrics)
+
+    # six chunks need two batchGet calls
+    assert sorted(len(b['reportRequests']) for b in RecordingGAClient.bodies) == [1, 5]
+    assert df.shape == (1, 60)
+    assert df.columns.tolist() == metrics
+
+
+def test_probe_merges_metric_chunks(monkeypatch):
+    monkeypatch.setattr(MockGABatch, 'execute', metrics_by_browser)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    metrics = [f'ga:metric{i}' for i in range(1, 16)]
+    ds = intake.open_google_analytics_query(
+        'VIEWID', start_date='5DaysAgo', end_date='yesterday',
+        metrics=metrics, dimensions=['ga:browser']
+    )
+    ds.discover()
+    assert list(ds.dtype) == ['ga:browser'] + metrics
+    assert ds.shape == (2, 16)
+    assert_frame_equal(ds.read(), ds._client.query(**ds._query_kwargs(0)))
+
+
+def test_iter_query_rejects_too_many_metrics():
+    ga_api = GoogleAnalyticsAPI(None)
+    with pytest.raises(ValueError):
+        next(ga_api.iter_query('VIEWID', start_date='5DaysAgo', end_date='yesterday',
+                               metrics=[f'ga:metric{i}' for i in range(11)]))
+
+
+def test_multiple_views(monkeypatch):
+    import threading
+    import time
+
+    views = []
+    in_flight = [0]
+    most_in_flight = [0]
+    lock = threading.Lock()
+
+    def execute(self):
+        with lock:
+            views.append(self.body['reportRequests'][0]['viewId'])
+            in_flight[0] += 1
+            most_in_flight[0] = max(most_in_flight[0], in_flight[0])
+        time.sleep(0.02)
+        with lock:
+            in_flight[0] -= 1
+        return daily_users(self)
+
+    monkeypatch.setattr(MockGABatch, 'execute', execute)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ds = intake.open_google_analytics_query(
+        ['VIEW1', 'VIEW2', 'VIEW3'],
+        start_date='2020-03-01', end_date='2020-03-19',
+        metrics=['ga:users'], dimensions=['ga:date'],
+        max_concurrent_views=2
+    )
+    ds.discover()
+    assert ds.npartitions == 3
+    assert list(ds.dtype) == ['view_id', 'ga:date', 'ga:users']
+
+    views.clear()
+    df = ds.read()
+    assert sorted(views) == ['VIEW1', 'VIEW2', 'VIEW3']
+    assert most_in_flight[0] == 2
+    assert df.columns.tolist() == ['view_id', 'ga:date', 'ga:users']
+    assert df['view_id'].tolist() == ['VIEW1'] * 19 + ['VIEW2'] * 19 + ['VIEW3'] * 19
+    assert_frame_equal(df[df['view_id'] == 'VIEW2'].drop(columns='view_id').reset_index(drop=True),
+                       daily_frame('2020-03-01', '2020-03-19'), check_dtype=False)
+
+    ddf = ds.to_dask()
+    assert ddf.npartitions == 3
+    assert_frame_equal(ddf.compute().reset_index(drop=True), df, check_dtype=False)
+
+
+def test_multiple_views_partitioned(monkeypatch):
+    monkeypatch.setattr(MockGABatch, 'execute', daily_users)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ds = intake.open_google_analytics_query(
+        ['VIEW1', 'VIEW2'],
+        start_date='2020-03-01', end_date='2020-03-19',
+        metrics=['ga:users'], dimensions=['ga:date'],
+        partition_by='week', categorical=True
+    )
+    ds.discover()
+    assert ds.npartitions == 2 * 4
+    assert ds.read_partition(4)['view_id'].unique().tolist() == ['VIEW2']
+
+    df = ds.read()
+    assert len(df) == 2 * 19
+    assert isinstance(df['view_id'].dtype, pd.CategoricalDtype)
+
+    chunks = list(ds.read_chunked())
+    assert sum(len(c) for c in chunks) == 2 * 19
+
+    table = ds.read_arrow()
+    assert table.column_names == ['view_id', 'ga:date', 'ga:users']
+    assert table.column('view_id').to_pylist() == ['VIEW1'] * 19 + ['VIEW2'] * 19
+
+
+def test_read_parallel(monkeypatch):
+    date_ranges = []
+
+    def execute(self):
+        date_ranges.append(self.body['reportRequests'][0]['dateRanges'][0])
+        return daily_users(self)
+
+    monkeypatch.setattr(MockGABatch, 'execute', execute)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ds = intake.open_google_analytics_query(
+        'VIEWID',
+        start_date='2020-03-01', end_date='2020-03-19',
+        metrics=['ga:users'], dimensions=['ga:date']
+    )
+    df = ds.read(parallel=4)
+
+    assert sorted(r['startDate'] for r in date_ranges) == \
+        ['2020-03-01', '2020-03-05', '2020-03-10', '2020-03-15']
+    assert_frame_equal(df, daily_frame('2020-03-01', '2020-03-19'), check_dtype=False)
+
+
+def test_read_parallel_without_date_dimension(monkeypatch):
+    date_ranges = []
+
+    def execute(self):
+        date_ranges.append(self.body['reportRequests'][0]['dateRanges'][0])
+        return sessions_by_browser(self)
+
+    monkeypatch.setattr(MockGABatch, 'execute', execute)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ds = intake.open_google_analytics_query(
+        'VIEWID',
+        start_date='2020-03-01', end_date='2020-03-19',
+        metrics=['ga:sessions'], dimensions=['ga:browser']
+    )
+    df = ds.read(parallel=4)
+
+    # summing per browser across ranges is not always valid, so the range is not split
+    assert date_ranges == [{'startDate': '2020-03-01', 'endDate': '2020-03-19'}]
+    assert df['ga:sessions'].tolist() == [19, 38]
+
+
+def test_plan_partitions(monkeypatch):
+    probes = []
+
+    def execute(self):
+        request = self.body['reportRequests'][0]
+        date_range = request['dateRanges'][0]
+        probes.append(date_range)
+        days = pd.date_range(date_range['startDate'], date_range['endDate'], freq='D')
+        # March 20th is a busy day
+        rows = sum(30 if d.day == 20 else 1 for d in days)
+        return {'reports': [
+            {'columnHeader': {'metricHeader': {'metricHeaderEntries': [
+                {'name': 'ga:users', 'type': 'INTEGER'}]}},
+             'data': {'rowCount': rows, 'rows': [{'metrics': [{'values': ['1']}]}]}}
+        ]}
+
+    monkeypatch.setattr(MockGABatch, 'execute', execute)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ga_api = GoogleAnalyticsAPI(None)
+    ranges = ga_api.plan_partitions('VIEWID', start_date='2020-03-01', end_date='2020-03-31',
+                                    metrics=['ga:users'], dimensions=['ga:date'],
+                                    rows_per_partition=20)
+
+    assert ranges == [
+        (dt.date(2020, 3, 1), dt.date(2020, 3, 19)),
+        (dt.date(2020, 3, 20), dt.date(2020, 3, 20)),
+        (dt.date(2020, 3, 21), dt.date(2020, 3, 31)),
+    ]
+    assert len(probes) == 12
+
+    # a range below the target needs a single probe
+    probes.clear()
+    ranges = ga_api.plan_partitions('VIEWID', start_date='2020-03-01', end_date='2020-03-31',
+                                    metrics=['ga:users'], dimensions=['ga:date'],
+                                    rows_per_partition=100)
+    assert ranges == [(dt.date(2020, 3, 1), dt.date(2020, 3, 31))]
+    assert len(probes) == 1
+
+    # without a daily dimension the range is never split
+    probes.clear()
+    ranges = ga_api.plan_partitions('VIEWID', start_date='2020-03-01', end_date='2020-03-31',
+                                    metrics=['ga:users'], dimensions=['ga:browser'],
+                                    rows_per_partition=20)
+    assert ranges == [(dt.date(2020, 3, 1), dt.date(2020, 3, 31))]
+    assert probes == []
+
+
+def test_auto_partitions(monkeypatch):
+    monkeypatch.setattr(MockGABatch, 'execute', daily_users)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ds = intake.open_google_analytics_query(
+        'VIEWID',
+        start_date='2020-03-01', end_date='2020-03-31',
+        metrics=['ga:users'], dimensions=['ga:date'],
+        partition_by='auto', rows_per_partition=10
+    )
+    ds.discover()
+
+    assert ds.npartitions == 4
+    assert [len(ds.read_partition(i)) for i in range(4)] == [7, 8, 8, 8]
+    assert_frame_equal(ds.read(), daily_frame('2020-03-01', '2020-03-31'), check_dtype=False)
+
+
+def test_auto_partitions_without_date_dimension(monkeypatch):
+    monkeypatch.setattr(MockGABatch, 'execute', sessions_by_browser)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: MockGAClient(x))
+
+    ds = intake.open_google_analytics_query(
+        'VIEWID',
+        start_date='2020-03-01', end_date='2020-03-31',
+        metrics=['ga:sessions'], dimensions=['ga:browser'],
+        partition_by='auto', rows_per_partition=1
+    )
+    ds.discover()
+
+    assert ds.npartitions == 1
+    assert ds.read()['ga:browser'].tolist() == ['Chrome', 'Safari']
+
+
+def test_read_columns(monkeypatch):
+    monkeypatch.setattr(MockGABatch, 'execute', metrics_by_browser)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: RecordingGAClient(x))
+    monkeypatch.setattr(RecordingGAClient, 'bodies', [])
+
+    ds = intake.open_google_analytics_query(
+        'VIEWID', start_date='5DaysAgo', end_date='yesterday',
+        metrics=['ga:metric1', {'expression': 'ga:metric2', 'alias': 'two'}, 'ga:metric3'],
+        dimensions=['ga:browser']
+    )
+
+    df = ds.read(columns=['two', 'ga:browser'])
+    request = RecordingGAClient.bodies[-1]['reportRequests'][0]
+    assert request['metrics'] == [{'expression': 'ga:metric2', 'alias': 'two'}]
+    assert request['dimensions'] == [{'name': 'ga:browser'}]
+    assert df.columns.tolist() == ['two', 'ga:browser']
+
+    # the API needs at least one metric
+    df = ds.read(columns=['ga:browser'])
+    request = RecordingGAClient.bodies[-1]['reportRequests'][0]
+    assert request['metrics'] == [{'expression': 'ga:metric1'}]
+    assert df.columns.tolist() == ['ga:browser']
+
+    with pytest.raises(ValueError):
+        ds.read(columns=['ga:metric4'])
+
+
+def test_to_dask_column_projection(monkeypatch):
+    monkeypatch.setattr(MockGABatch, 'execute', metrics_by_browser)
+    monkeypatch.setattr(GoogleAnalyticsAPI, 'create_client', lambda x: RecordingGAClient(x))
+    monkeypatch.setattr(RecordingGAClient, 'bodies', [])
+
+    ds = intake.open_google_analytics_query(
+        'VIEWID', start_date='2020-03-01', end_date='2020-03-19',
+        metrics=['ga:metric1', 'ga:metric2', 'ga:metric3'],
+        dimensions=['ga:browser'], partition_by='week'
+    )
+    ddf = ds.to_dask()
+    RecordingGAClient.bodies.clear()
+
+    df = ddf[['ga:browser', 'ga:metric3']].compute(scheduler='sync')
+
+    assert len(RecordingGAClient.bodies) == ds.npartitions
+    assert all(b['reportRequests'][0]['metrics'] == [{'expression': 'ga:metric3'}]
+               for b in RecordingGAClient.bodies)
+    assert df.columns.tolist() == ['ga:browser', 'ga:metric3']
+    assert df['ga:metric3'].tolist() == [3, 6] * ds.npartitions
+
+
+def test_unsampled_rejects_pages():
+    ds = intake.open_google_analytics_query(
+        'VIEWID', start_date='2020-03-01', end_date='2020-03-19',
+        metrics=['ga:users'], dimensions=['ga:date'], unsampled=True
+    )
+    with pytest.raises(ValueError):
+        next(ds.read_chunked())
+    with pytest.raises(ValueError):
+        ds.read_arrow()
+
+
+def test_checkpoint_resolves_relative_dates(monkeypatch, tmp_path):
+    from intake_google_analytics import checkpoint, utils
+    from intake_google_analytics.checkpoint import Checkpoint
+
+    body = {'reportRequests': [{'viewId': 'VIEWID', 'metrics': [{'expression': 'ga:users'}],
+                                'dateRanges': [{'startDate': '5DaysAgo', 'endDate': 'yesterday'}]}]}
+    today = dt.date.today()
+    concrete = copy.deepcopy(body)
+    concrete['reportRequests'][0]['dateRanges'] = [
+        {'startDate': str(today - dt.timedelta(days=5)),
+         'endDate': str(today - dt.timedelta(days=1))}]
+
+    first = Checkpoint(str(tmp_path), body)
+    assert first.path == Checkpoint(str(tmp_path), concrete).path
+
+    # the same relative range resumed on the next day
+    tomorrow = today + dt.timedelta(days=1)
+    monkeypatch.setattr(checkpoint, 'resolve_date',
+                        lambda value: utils.resolve_date(value, today=tomorrow))
+    assert Checkpoint(str(tmp_path), body).path != first.path
+
+
+def test_empty_report_dtypes():
+    report = {
+        'columnHeader':
+            {'dimensions': ['ga:browser', 'ga:date'],
+             'metricHeader': {'metricHeaderEntries': [{'name': 'ga:users', 'type': 'INTEGER'}]}},
+            'data': {'rowCount': 0}
+    }
+    df = GoogleAnalyticsAPI._to_dataframe(report)
+    assert df['ga:browser'].dtype == object
+    assert is_datetime64_any_dtype(df['ga:date'])
+    assert is_integer_dtype(df['ga:users'])
+
+    report['data'] = {'rowCount': 1, 'rows': [
+        {'dimensions': ['Chrome', '20200319'], 'metrics': [{'values': ['1']}]}]}
+    df = GoogleAnalyticsAPI._to_dataframe(report)
+    assert is_string_dtype(df['ga:browser'])
+
+
+def test_week_dimensions_are_not_dates():
+    report = {
+        'columnHeader':
+            {'dimensions': ['ga:isoYearIsoWeek', 'ga:yearWeek'],
+             'metricHeader': {'metricHeaderEntries': [{'name': 'ga:users', 'type': 'INTEGER'}]}},
+            'data': {'rowCount': 2, 'rows': [
+                {'dimensions': ['202012', '202012'], 'metrics': [{'values': ['1']}]},
+                {'dimensions': ['202053', '202053'], 'metrics': [{'values': ['2']}]},
+            ]}
+    }
+    df = GoogleAnalyticsAPI._to_dataframe(report)
+    assert df['ga:isoYearIsoWeek'].tolist() == ['202012', '202053']
+    assert df['ga:yearWeek'].tolist() == ['202012', '202053']
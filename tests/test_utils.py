@@ -2,7 +2,10 @@ import datetime as dt
 
 import pandas as pd
 import pytest
-from intake_google_analytics.utils import as_day, is_dt
+from intake_google_analytics.utils import (as_day, date_ranges, is_dt, merge_sampling,
+                                           merge_date_ranges, parse_date_values, resolve_date,
+                                           sampling_stats, split_date_range,
+                                           subtract_date_ranges)
 
 
 def test_is_dt():
@@ -27,3 +30,114 @@ def test_as_day():
         as_day(dt.timedelta(days=1))
         as_day(pd.DateOffset(days=1))
         as_day('2020-03-19')
+
+
+def test_resolve_date():
+    today = dt.date(2020, 3, 19)
+    assert resolve_date('today', today=today) == today
+    assert resolve_date('yesterday', today=today) == dt.date(2020, 3, 18)
+    assert resolve_date('5DaysAgo', today=today) == dt.date(2020, 3, 14)
+    assert resolve_date('2020-03-01', today=today) == dt.date(2020, 3, 1)
+    assert resolve_date(dt.datetime(2020, 3, 1, 16, 20), today=today) == dt.date(2020, 3, 1)
+    assert resolve_date(pd.Timestamp(2020, 3, 1), today=today) == dt.date(2020, 3, 1)
+    assert resolve_date(dt.date(2020, 3, 1), today=today) == dt.date(2020, 3, 1)
+
+    with pytest.raises(ValueError):
+        resolve_date('tomorrow')
+
+
+def test_date_ranges():
+    assert date_ranges('2020-03-18', '2020-03-19', 'day') == [
+        (dt.date(2020, 3, 18), dt.date(2020, 3, 18)),
+        (dt.date(2020, 3, 19), dt.date(2020, 3, 19))
+    ]
+
+    # weeks run Monday to Sunday and are clipped to the requested range
+    assert date_ranges('2020-03-19', '2020-03-24', 'week') == [
+        (dt.date(2020, 3, 19), dt.date(2020, 3, 22)),
+        (dt.date(2020, 3, 23), dt.date(2020, 3, 24))
+    ]
+
+    assert date_ranges(dt.date(2020, 1, 30), dt.date(2020, 3, 3), 'month') == [
+        (dt.date(2020, 1, 30), dt.date(2020, 1, 31)),
+        (dt.date(2020, 2, 1), dt.date(2020, 2, 29)),
+        (dt.date(2020, 3, 1), dt.date(2020, 3, 3))
+    ]
+
+    with pytest.raises(ValueError):
+        date_ranges('2020-03-19', '2020-03-24', 'fortnight')
+
+    with pytest.raises(ValueError):
+        date_ranges('2020-03-24', '2020-03-19', 'day')
+
+
+def test_sampling_stats():
+    assert sampling_stats({'rowCount': 1}) == {
+        'sampled': False, 'samples_read': 0, 'sampling_space': 0, 'is_data_golden': False}
+    assert sampling_stats({'samplesReadCounts': ['10', '20'], 'samplingSpaceSizes': ['100', '200'],
+                           'isDataGolden': True}) == {
+        'sampled': True, 'samples_read': 30, 'sampling_space': 300, 'is_data_golden': True}
+
+
+def test_merge_sampling():
+    unsampled = sampling_stats({'isDataGolden': True})
+    sampled = sampling_stats({'samplesReadCounts': ['10'], 'samplingSpaceSizes': ['100']})
+
+    assert merge_sampling([]) is None
+    assert merge_sampling([None, unsampled]) == unsampled
+    assert merge_sampling([unsampled, sampled]) == {
+        'sampled': True, 'samples_read': 10, 'sampling_space': 100, 'is_data_golden': False}
+
+
+@pytest.mark.parametrize('values, format', [
+    (['20200319', '20200229', '20200319'], '%Y%m%d'),
+    (['2020031900', '2020031923'], '%Y%m%d%H'),
+    (['202003191305', '202012312359'], '%Y%m%d%H%M'),
+    (['202003', '201912'], '%Y%m'),
+    ([], '%Y%m%d'),
+])
+def test_parse_date_values(values, format):
+    parsed = parse_date_values(values, format)
+    expected = pd.to_datetime(pd.Series(values, dtype=str), format=format)
+    assert parsed.dtype == 'datetime64[us]'
+    assert (parsed == expected.to_numpy()).all()
+
+
+@pytest.mark.parametrize('value', ['20200230', '20201301', '2020031', 'March 19', '(other)'])
+def test_parse_date_values_invalid(value):
+    with pytest.raises(ValueError):
+        parse_date_values(['20200319', value], '%Y%m%d')
+
+
+def test_split_date_range():
+    assert split_date_range('2020-03-01', '2020-03-10', 3) == [
+        (dt.date(2020, 3, 1), dt.date(2020, 3, 3)),
+        (dt.date(2020, 3, 4), dt.date(2020, 3, 6)),
+        (dt.date(2020, 3, 7), dt.date(2020, 3, 10)),
+    ]
+    assert split_date_range('2020-03-01', '2020-03-02', 5) == [
+        (dt.date(2020, 3, 1), dt.date(2020, 3, 1)),
+        (dt.date(2020, 3, 2), dt.date(2020, 3, 2)),
+    ]
+    assert split_date_range(dt.date(2020, 3, 1), dt.date(2020, 3, 1), 1) == [
+        (dt.date(2020, 3, 1), dt.date(2020, 3, 1))
+    ]
+
+    with pytest.raises(ValueError):
+        split_date_range('2020-03-02', '2020-03-01', 2)
+
+
+def test_merge_date_ranges():
+    d = lambda day: dt.date(2020, 3, day)  # noqa: E731
+    assert merge_date_ranges([]) == []
+    assert merge_date_ranges([(d(10), d(12)), (d(1), d(5)), (d(6), d(8))]) == \
+        [(d(1), d(8)), (d(10), d(12))]
+    assert merge_date_ranges([(d(1), d(10)), (d(3), d(4))]) == [(d(1), d(10))]
+
+
+def test_subtract_date_ranges():
+    d = lambda day: dt.date(2020, 3, day)  # noqa: E731
+    assert subtract_date_ranges(d(1), d(31), []) == [(d(1), d(31))]
+    assert subtract_date_ranges(d(1), d(31), [(d(5), d(9)), (d(20), d(31))]) == \
+        [(d(1), d(4)), (d(10), d(19))]
+    assert subtract_date_ranges(d(5), d(9), [(d(1), d(31))]) == []